@@ -0,0 +1,411 @@
+"""
+PATH: ./wix-scraper/bench/
+
+Benchmark harness. Every performance change should be judged against its numbers.
+
+Suites:
+- crawl: runs `python -m utils.scrape` (or `utils.shard coordinate` with --shards > 1) against
+  bench.site.SyntheticSite and reads the run report (pages/s, p50/p95 page latency, peak RSS of
+  the crawler process tree's largest child).
+- hash:  hash_and_compare on two generated snapshots (MB/s).
+- diff:  generate_diff_report on the same snapshots (changed files/s, MB/s), with an empty diff
+  cache and again with a warm one.
+- pdf:   text extraction from generated PDFs (pages/s) with the --pdf-backend, with every page
+  in the page cache, and with plain pdfminer extract_text for reference.
+- startup: import time of each entry point in a fresh interpreter, over a bare `python -c pass`
+  (ms), with no crawl/OpenAI settings in the environment. Light commands must not import any
+  HEAVY_MODULES; --check exits non-zero if one does.
+
+Results are written as JSON tagged with the git commit; pass --baseline to print deltas against
+an earlier result file.
+
+Functions:
+- make_snapshots(root, files, lines, change_rate, seed): Writes an old/new pair of snapshot dirs.
+- bench_crawl(spec, workdir, shards): Crawls the synthetic site in a subprocess, summarises the run report.
+- bench_hash(old, new, repeat): Times hash_and_compare.
+- bench_diff(old, new, repeat): Times generate_diff_report.
+- bench_pdf(workdir, docs, pages, repeat, backend): Times PDF text extraction.
+- bench_startup(repeat): Times entry-point imports and lists heavy modules they drag in.
+- compare_results(current, baseline): Prints a metric-by-metric delta table.
+- main(): CLI entry point.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bench.site import SiteSpec, SyntheticSite, make_pdf
+
+BASE_DIR = Path(__file__).resolve().parents[1]  # /wix-scraper/
+BENCH_RESULTS = BASE_DIR / "bench" / "results"
+PAGE_STAGES = ("navigate", "password_wall", "extract", "save", "links", "tabs")
+
+# entry point -> module imported by `python -m`; the light ones must stay free of HEAVY_MODULES.
+STARTUP_MODULES = {
+    "compare": "utils.compare",
+    "hashcomparator": "utils.diffscripts.hashcomparator",
+    "pipeline": "utils.pipeline",
+    "cli": "cli",
+    "summarize": "utils.summarize",
+    "scrape": "utils.scrape",
+}
+LIGHT_COMMANDS = ("compare", "hashcomparator", "pipeline", "cli")
+HEAVY_MODULES = ("playwright", "bs4", "pdfminer", "openai", "pydantic_settings", "googleapiclient")
+STARTUP_ENV_DROP = ("START_URL", "WIX_PASSWORD", "SITES", "SITES_FILE", "OPENAI_API_KEY")
+
+# Lower is better for these; everything else reported is a throughput (higher is better).
+LOWER_IS_BETTER = {
+    "p50_page_seconds",
+    "p95_page_seconds",
+    "peak_rss_mb",
+    "seconds",
+    "wall_seconds",
+}
+
+
+def _git_commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except OSError:
+        return "unknown"
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def make_snapshots(
+    root: Path, files: int, lines: int, change_rate: float, seed: int = 1234
+) -> tuple[Path, Path]:
+    rng = random.Random(seed)
+    now = datetime.now()
+    old = root / (now - timedelta(days=1)).strftime("%y%m%d-%H%M%S")
+    new = root / now.strftime("%y%m%d-%H%M%S")
+    old.mkdir(parents=True)
+    new.mkdir(parents=True)
+
+    words = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima".split()
+    for i in range(files):
+        body = [" ".join(rng.choice(words) for _ in range(12)) + "\n" for _ in range(lines)]
+        (old / f"page_{i:05d}.txt").write_text("".join(body), encoding="utf-8")
+        if rng.random() < change_rate:
+            for _ in range(max(1, lines // 50)):
+                body[rng.randrange(lines)] = "changed " + " ".join(rng.choices(words, k=10)) + "\n"
+        (new / f"page_{i:05d}.txt").write_text("".join(body), encoding="utf-8")
+    return old, new
+
+
+def bench_crawl(spec: SiteSpec, workdir: Path, shards: int = 1, timeout: float = 1800) -> dict:
+    results_root = workdir / "crawl"
+    results_root.mkdir(parents=True, exist_ok=True)
+
+    with SyntheticSite(spec) as site:
+        env = dict(
+            os.environ,
+            START_URL=site.url,
+            WIX_PASSWORD=spec.password,
+            RESULTS_ROOT=str(results_root),
+            METRICS_PORT="0",
+            # The stand-in site's pages are all /page/{n}; a cap would stop the crawl at 100.
+            URL_TEMPLATE_CAP="0",
+        )
+        cmd = [sys.executable, "-m", "utils.scrape"]
+        if shards > 1:
+            cmd = [sys.executable, "-m", "utils.shard", "coordinate", "--shards", str(shards)]
+        started = time.perf_counter()
+        proc = subprocess.run(
+            cmd,
+            cwd=BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        wall = time.perf_counter() - started
+        requests = site.stats.get("requests", 0)
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"crawl failed ({proc.returncode}):\n{proc.stderr[-4000:]}")
+
+    reports = sorted(results_root.glob("*/.run_report.json"))
+    if not reports:
+        raise RuntimeError(f"crawl produced no run report under {results_root}")
+    report = json.loads(reports[-1].read_text(encoding="utf-8"))
+
+    latencies = [
+        sum(fields.get(stage, 0.0) for stage in PAGE_STAGES)
+        for fields in report["pages"].values()
+        if "navigate" in fields
+    ]
+    pages_done = report["counters"].get("pages_done", 0)
+    return {
+        "pages": spec.pages,
+        "shards": shards,
+        "pages_done": pages_done,
+        "wall_seconds": wall,
+        "pages_per_second": pages_done / wall if wall else 0.0,
+        "p50_page_seconds": _percentile(latencies, 0.50),
+        "p95_page_seconds": _percentile(latencies, 0.95),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "server_requests": requests,
+        "retries": report["counters"].get("retries", 0),
+        "failures": report["counters"].get("failures", 0),
+    }
+
+
+def bench_hash(old: Path, new: Path, repeat: int) -> dict:
+    from utils.diffscripts.hashcomparator import hash_and_compare
+
+    seconds = _best_of(repeat, lambda: hash_and_compare(str(old), str(new)))
+    total = _dir_bytes(old) + _dir_bytes(new)
+    return {"seconds": seconds, "mb_per_second": total / 2**20 / seconds}
+
+
+def bench_diff(old: Path, new: Path, repeat: int) -> dict:
+    from utils.diffscripts.diffcache import DiffCache
+    from utils.diffscripts.diffgen import generate_diff_report
+    from utils.diffscripts.hashcomparator import hash_and_compare
+
+    changed, added, removed = hash_and_compare(str(old), str(new))
+    caches = (old.parent / f".diffcache-{n}.sqlite" for n in itertools.count())
+
+    def report(cache: DiffCache):
+        generate_diff_report(changed, added, removed, str(old), str(new), cache=cache)
+
+    # A fresh cache per repeat: the first compare of a snapshot pair, which fills the cache.
+    seconds = _best_of(repeat, lambda: report(DiffCache(next(caches))))
+    warm = DiffCache(next(caches))
+    report(warm)
+    cached_seconds = _best_of(repeat, lambda: report(warm))  # re-running compare
+    changed_bytes = sum((old / f).stat().st_size + (new / f).stat().st_size for f in changed)
+    return {
+        "seconds": seconds,
+        "changed_files": len(changed),
+        "files_per_second": len(changed) / seconds if seconds else 0.0,
+        "mb_per_second": changed_bytes / 2**20 / seconds if seconds else 0.0,
+        "cached_files_per_second": len(changed) / cached_seconds if cached_seconds else 0.0,
+    }
+
+
+def bench_pdf(
+    workdir: Path, docs: int, pages: int, repeat: int, backend: str = "pdfminer"
+) -> dict:
+    from pdfminer.high_level import extract_text
+
+    from utils.multimedia.pdfbackends import PDFExtractor
+
+    rng = random.Random(99)
+    pdf_dir = workdir / "pdf"
+    pdf_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for k in range(docs):
+        text = [
+            [f"Line {n} of page {p}: " + "x" * rng.randint(20, 80) for n in range(40)]
+            for p in range(pages)
+        ]
+        path = pdf_dir / f"doc_{k}.pdf"
+        path.write_bytes(make_pdf(text))
+        paths.append(path)
+
+    total = docs * pages
+    uncached = PDFExtractor(backend, cache_dir=None)
+    seconds = _best_of(repeat, lambda: [uncached.extract(p) for p in paths])
+    # Every page already in the page cache: what an unchanged PDF costs on the next crawl.
+    cached = PDFExtractor(backend, cache_dir=workdir / "pdfpages")
+    [cached.extract(p) for p in paths]
+    cached_seconds = _best_of(repeat, lambda: [cached.extract(p) for p in paths])
+    extract_text_seconds = _best_of(repeat, lambda: [extract_text(p) for p in paths])
+    return {
+        "backend": uncached.backend.name,
+        "seconds": seconds,
+        "pages_per_second": total / seconds,
+        "cached_pages_per_second": total / cached_seconds,
+        "extract_text_pages_per_second": total / extract_text_seconds,  # the pre-backend path
+    }
+
+
+def bench_startup(repeat: int) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in STARTUP_ENV_DROP}
+
+    def run(code: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True
+        )
+
+    bare = _best_of(repeat, lambda: run("pass"))
+    result = {"interpreter_ms": bare * 1000}
+    leaks = []
+    for name, module in STARTUP_MODULES.items():
+        seconds = _best_of(repeat, lambda: run(f"import {module}"))
+        result[f"{name}_ms"] = max(seconds - bare, 0.0) * 1000
+        if name in LIGHT_COMMANDS:
+            proc = run(
+                f"import sys, {module}; "
+                f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+            leaks += [f"{name}:{m}" for m in proc.stdout.split()]
+    result["heavy_imports"] = ",".join(leaks) or "none"
+    return result
+
+
+def compare_results(current: dict, baseline: dict) -> None:
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'delta':>9}")
+    print(f"  baseline commit: {baseline.get('commit')}   current commit: {current.get('commit')}")
+    for suite, metrics in current.get("suites", {}).items():
+        for name, value in metrics.items():
+            base = baseline.get("suites", {}).get(suite, {}).get(name)
+            if (
+                not isinstance(value, (int, float))
+                or not isinstance(base, (int, float))
+                or not base
+            ):
+                continue
+            delta = (value - base) / base * 100
+            lower = name in LOWER_IS_BETTER or name.endswith("_ms")
+            better = delta < 0 if lower else delta > 0
+            marker = "+" if better else ("-" if abs(delta) > 0.5 else " ")
+            print(f"{suite + '.' + name:<40} {base:>12.4g} {value:>12.4g} {delta:>8.1f}% {marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crawler, compare and PDF stages.")
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=["crawl", "hash", "diff", "pdf", "startup"],
+        help="Suites to run (repeatable, default: all)",
+    )
+    parser.add_argument("--pages", type=int, default=SiteSpec.pages, help="Synthetic site pages")
+    parser.add_argument("--pdfs", type=int, default=SiteSpec.pdfs, help="Synthetic site PDFs")
+    parser.add_argument("--no-password", action="store_true", help="Disable the password wall")
+    parser.add_argument("--shards", type=int, default=1, help="Crawler processes (utils.shard)")
+    parser.add_argument("--files", type=int, default=2000, help="Files per generated snapshot")
+    parser.add_argument("--lines", type=int, default=200, help="Lines per generated file")
+    parser.add_argument("--change-rate", type=float, default=0.2, help="Fraction of files changed")
+    parser.add_argument("--pdf-docs", type=int, default=5)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument(
+        "--pdf-backend",
+        default="pdfminer",
+        help="utils.multimedia.pdfbackends backend (PDF_BACKEND)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Micro-benchmark repetitions (best of)"
+    )
+    parser.add_argument("--baseline", type=Path, help="Earlier result JSON to compare against")
+    parser.add_argument(
+        "--out", type=Path, help="Result file (default: bench/results/<ts>-<commit>.json)"
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    parser.add_argument(
+        "--check", action="store_true", help="Exit 1 if a light command imports a heavy module"
+    )
+    args = parser.parse_args()
+    suites = args.suite or ["crawl", "hash", "diff", "pdf", "startup"]
+
+    workdir = Path(tempfile.mkdtemp(prefix="wix-bench-"))
+    # Keep exports and snapshots out of the real results/ tree; utils.* read this at import.
+    os.environ["RESULTS_ROOT"] = str(workdir / "results")
+    os.environ.setdefault("START_URL", "http://127.0.0.1/")
+
+    commit = _git_commit()
+    result = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": vars(args) | {"suite": suites, "baseline": None, "out": None},
+        "suites": {},
+    }
+
+    try:
+        if "crawl" in suites:
+            spec = SiteSpec(
+                pages=args.pages,
+                pdfs=args.pdfs,
+                password="" if args.no_password else SiteSpec.password,
+            )
+            result["suites"]["crawl"] = bench_crawl(spec, workdir, args.shards)
+        if "hash" in suites or "diff" in suites:
+            old, new = make_snapshots(
+                workdir / "results", args.files, args.lines, args.change_rate
+            )
+            if "hash" in suites:
+                result["suites"]["hash"] = bench_hash(old, new, args.repeat)
+            if "diff" in suites:
+                result["suites"]["diff"] = bench_diff(old, new, args.repeat)
+        if "pdf" in suites:
+            result["suites"]["pdf"] = bench_pdf(
+                workdir, args.pdf_docs, args.pdf_pages, args.repeat, args.pdf_backend
+            )
+        if "startup" in suites:
+            result["suites"]["startup"] = bench_startup(max(args.repeat, 5))
+        result["peak_rss_mb_self"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or BENCH_RESULTS / f"{datetime.now():%y%m%d-%H%M%S}-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    for suite, metrics in result["suites"].items():
+        print(f"[{suite}]")
+        for name, value in metrics.items():
+            print(
+                f"  {name:<22} {value:.4g}"
+                if isinstance(value, float)
+                else f"  {name:<22} {value}"
+            )
+    print(f"\nResults written to {out}")
+
+    if args.baseline:
+        compare_results(result, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+    leaks = result["suites"].get("startup", {}).get("heavy_imports", "none")
+    if leaks != "none":
+        print(f"\nStartup regression: light commands import heavy modules ({leaks})")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
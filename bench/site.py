@@ -0,0 +1,275 @@
+"""
+PATH: ./wix-scraper/bench/
+
+Synthetic Wix-like site served from a local HTTP server, so the crawler can be benchmarked
+without touching the live exercise site.
+
+Functions:
+- SiteSpec: Shape of the generated site (pages, iframes, tabs, password wall, slow pages, PDFs...).
+- make_pdf(pages): Builds a minimal text-only PDF with one page per entry in `pages`.
+- page_text(spec, i): Deterministic body text for page i (changes with spec.revision).
+- SyntheticSite(spec): Threaded HTTP server; use as a context manager, .url is the start URL.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "applia korame watogan kanawhaton monacova vostain waccamaw border troops convoy bridge "
+    "river harbour council minister election protest market currency pipeline rail airfield "
+    "radio broadcast weather storm harvest ferry port clinic school militia patrol"
+).split()
+
+PNG_1X1 = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+@dataclass
+class SiteSpec:
+    pages: int = 50
+    links_per_page: int = 4
+    paragraphs: int = 8
+    iframes: int = 1  # per page
+    tabs: int = 2  # per page
+    password: str = "bench"  # empty disables the password wall
+    slow_every: int = 10  # every Nth page embeds a slow image; 0 disables
+    slow_ms: int = 1500
+    forbidden_every: int = 15  # every Nth page answers FORBIDDEN on its first hit; 0 disables
+    pdfs: int = 5
+    pdf_pages: int = 4
+    revision: int = 0  # bump to mutate ~change_rate of the pages between runs
+    change_rate: float = 0.2
+    seed: int = 1234
+
+
+def make_pdf(pages: list[list[str]]) -> bytes:
+    """Minimal PDF 1.4 writer: Helvetica text, one content stream per page, valid xref."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        escaped = [
+            ln.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for ln in lines
+        ]
+        body = "BT /F1 11 Tf 14 TL 50 780 Td " + " ".join(f"({ln}) '" for ln in escaped) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+def _sentences(rng: random.Random, count: int) -> list[str]:
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def page_text(spec: SiteSpec, i: int) -> list[str]:
+    rng = random.Random(spec.seed * 100_003 + i)
+    paragraphs = _sentences(rng, spec.paragraphs)
+    # Each revision rewrites one paragraph on a stable, seeded subset of pages.
+    for rev in range(1, spec.revision + 1):
+        rev_rng = random.Random(spec.seed * 7919 + rev * 104_729 + i)
+        if rev_rng.random() < spec.change_rate:
+            paragraphs[rev_rng.randrange(len(paragraphs))] = (
+                f"Update {rev}: " + _sentences(rev_rng, 1)[0]
+            )
+    return paragraphs
+
+
+def pdf_bytes(spec: SiteSpec, k: int) -> bytes:
+    rng = random.Random(spec.seed * 31 + k)
+    return make_pdf([_sentences(rng, 30) for _ in range(spec.pdf_pages)])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    site: "SyntheticSite"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(
+        self, status: int, body: bytes, ctype: str = "text/html; charset=utf-8", headers=None
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authed(self) -> bool:
+        if not self.site.spec.password:
+            return True
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return "auth" in cookie and cookie["auth"].value == "1"
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        if parsed.path != "/login":
+            self._send(404, b"not found")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        target = parse_qs(parsed.query).get("next", ["/"])[0]
+        if form.get("password", [""])[0] != self.site.spec.password:
+            self._send(303, b"", headers={"Location": target})
+            return
+        self._send(303, b"", headers={"Location": target, "Set-Cookie": "auth=1; Path=/"})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        spec = self.site.spec
+        self.site.count("requests")
+
+        if parsed.path == "/":
+            self._page(0, parsed.path)
+        elif len(parts) == 2 and parts[0] == "page" and parts[1].isdigit():
+            self._page(int(parts[1]), parsed.path)
+        elif len(parts) == 3 and parts[0] == "frame":
+            rng = random.Random(spec.seed + int(parts[1]) * 1000 + int(parts[2]))
+            body = "<html><body><p>" + " ".join(_sentences(rng, 3)) + "</p></body></html>"
+            self._send(200, body.encode())
+        elif len(parts) == 2 and parts[0] == "slow":
+            time.sleep(spec.slow_ms / 1000)
+            self._send(200, PNG_1X1, "image/png")
+        elif len(parts) == 2 and parts[0] == "docs" and parts[1].endswith(".pdf"):
+            k = int(parts[1][:-4])
+            self._send(200, pdf_bytes(spec, k), "application/pdf")
+        else:
+            self._send(404, b"not found")
+
+    def _page(self, i: int, path: str):
+        spec = self.site.spec
+        if not 0 <= i < spec.pages:
+            self._send(404, b"not found")
+            return
+
+        if not self._authed():
+            body = (
+                "<html><body><h1>Password Protected</h1>"
+                f'<form method="post" action="/login?next={path}">'
+                '<input type="password" name="password"></form></body></html>'
+            )
+            self._send(200, body.encode())
+            return
+
+        if spec.forbidden_every and i % spec.forbidden_every == spec.forbidden_every - 1:
+            if self.site.first_hit(path):
+                self._send(200, b"<html><body>ERROR: FORBIDDEN</body></html>")
+                return
+
+        paragraphs = "".join(f"<p>{p}</p>" for p in page_text(spec, i))
+        links = "".join(
+            f'<a href="/page/{(i * 7 + j * 13 + 1) % spec.pages}">link {j}</a> '
+            for j in range(spec.links_per_page)
+        )
+        if spec.pdfs:
+            links += f'<a href="/docs/{i % spec.pdfs}.pdf">document</a>'
+        frames = "".join(f'<iframe src="/frame/{i}/{j}"></iframe>' for j in range(spec.iframes))
+        tabs = ""
+        if spec.tabs:
+            buttons = "".join(
+                f'<button role="tab" onclick="document.getElementById(\'panel\').textContent='
+                f"'Panel {j} of page {i}'\">Tab {j}</button>"
+                for j in range(spec.tabs)
+            )
+            tabs = f'<div role="tablist">{buttons}</div><div id="panel">Panel 0 of page {i}</div>'
+        slow = ""
+        if spec.slow_every and i % spec.slow_every == spec.slow_every - 1:
+            slow = f'<img src="/slow/{i}.png">'
+
+        body = (
+            f'<html><head><title>Page {i}</title></head><body><div id="SITE_CONTAINER">'
+            f"<h1>Page {i}</h1>{paragraphs}{tabs}{frames}{slow}<nav>{links}</nav>"
+            "</div></body></html>"
+        )
+        self._send(200, body.encode())
+
+
+class SyntheticSite:
+    def __init__(self, spec: SiteSpec, host: str = "127.0.0.1", port: int = 0):
+        self.spec = spec
+        self._lock = threading.Lock()
+        self._seen: set[str] = set()
+        self.stats: dict[str, int] = {}
+        handler = type("Handler", (_Handler,), {"site": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def first_hit(self, path: str) -> bool:
+        with self._lock:
+            if path in self._seen:
+                return False
+            self._seen.add(path)
+            return True
+
+    def __enter__(self) -> "SyntheticSite":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the synthetic benchmark site.")
+    parser.add_argument("--pages", type=int, default=SiteSpec.pages)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--password", default=SiteSpec.password)
+    args = parser.parse_args()
+
+    with SyntheticSite(SiteSpec(pages=args.pages, password=args.password), port=args.port) as site:
+        print(f"Serving {args.pages} pages at {site.url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -4,25 +4,40 @@ PATH: ./wix-scraper/
 Functions:
 - prompt_yes_no(msg): Prompts user for a yes/no response in the terminal.
 - main(): Executes scraper and/or diff comparison workflows based on user prompts.
+  `--profile [sample|cprofile]` profiles the whole session; other arguments go to the compare CLI.
+  The scraper (Playwright) and compare modules are only imported once their step is chosen.
 """
 
+import argparse
 import asyncio
-from utils.scrape import main as run_scraper
-from utils.compare import cli as run_diff
+
+from utils.profiling import add_profile_args, mark_stage, profiled
+from utils.snapshots import RESULTS_ROOT
 from utils.yn import prompt_yes_no
 
 
 def main():
-    if prompt_yes_no("Do you want to run the scraper?"):
-        print("Launching scraper...")
-        asyncio.run(run_scraper())
+    parser = argparse.ArgumentParser(description="Interactive scrape / compare workflow.")
+    add_profile_args(parser)
+    args, diff_argv = parser.parse_known_args()
+
+    with profiled(args.profile, args.profile_dir or RESULTS_ROOT, "cli"):
+        if prompt_yes_no("Do you want to run the scraper?"):
+            print("Launching scraper...")
+            from utils.scrape import main as run_scraper
+
+            asyncio.run(run_scraper())
+            mark_stage("scrape")
+
+        if prompt_yes_no("Do you want to run a diff comparison?"):
+            print("Launching comparison CLI...")
+            from utils.compare import cli as run_diff
 
-    if prompt_yes_no("Do you want to run a diff comparison?"):
-        print("Launching comparison CLI...")
-        run_diff()
+            run_diff(diff_argv)
+            mark_stage("compare")
 
     print("\nCLI workflow complete.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
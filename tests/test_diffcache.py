@@ -0,0 +1,98 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.diffscripts.diffcache through diffgen: identical file pairs are diffed once per run, reports
+rendered from cached hunks match freshly diffed ones, and eviction drops the least recently used
+entries.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import itertools
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils.diffscripts import diffcache, diffgen
+from utils.diffscripts.diffcache import DiffCache
+
+OLD = "Header\nOpening hours: 9-17\nFooter\n"
+NEW = "Header\nOpening hours: 10-16\nClosed on Mondays\nFooter\n"
+PDF_OLD = "=== [page 1] ===\nQuarterly report\n=== [page 2] ===\nRevenue 10\n"
+PDF_NEW = "=== [page 1] ===\nQuarterly report\n=== [page 2] ===\nRevenue 12\n"
+
+
+class DiffCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.old, self.new = self.root / "250101-100000", self.root / "250108-100000"
+        self.files = {
+            "a.txt": (OLD, NEW),
+            "b.txt": (OLD, NEW),
+            "report.pdf.txt": (PDF_OLD, PDF_NEW),
+        }
+        for name, (old, new) in self.files.items():
+            for snapshot, text in ((self.old, old), (self.new, new)):
+                snapshot.mkdir(exist_ok=True)
+                (snapshot / name).write_text(text, encoding="utf-8")
+        patch = mock.patch.object(diffgen, "RESULTS_ROOT", self.root)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.cache_path = self.root / ".cache" / "diffs.sqlite"
+
+    def report(self, cache: DiffCache | None) -> str:
+        with mock.patch.object(diffgen, "default_cache", lambda: None):
+            diffgen.generate_diff_report(
+                sorted(self.files), [], [], self.old, self.new, cache=cache
+            )
+        return diffgen.diff_report_path(self.old, self.new).read_text(encoding="utf-8")
+
+    def test_identical_pairs_are_diffed_once_per_run(self):
+        cache = DiffCache(self.cache_path)
+        with mock.patch.object(diffgen, "diff_hunks", wraps=diffgen.diff_hunks) as diff_hunks:
+            first = diffgen.diff_file("a.txt", self.old, self.new, cache)
+            second = diffgen.diff_file("b.txt", self.old, self.new, cache)
+        self.assertEqual(diff_hunks.call_count, 1)
+        self.assertEqual((cache.misses, cache.memo_hits, cache.hits), (1, 1, 0))
+        self.assertEqual(first.replace("a.txt", "b.txt"), second)
+
+    def test_cached_report_matches_a_fresh_one(self):
+        fresh = self.report(None)
+        cold = self.report(DiffCache(self.cache_path))
+        warm_cache = DiffCache(self.cache_path)
+        with mock.patch.object(diffgen, "diff_hunks") as diff_hunks:
+            warm = self.report(warm_cache)
+        diff_hunks.assert_not_called()
+        self.assertIn("Closed on Mondays", fresh)
+        self.assertIn("page 2", fresh)
+        self.assertEqual(cold, fresh)
+        self.assertEqual(warm, fresh)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        hunks = [["replace", None, None, 1, 2, 1, 3]]
+
+        def entry_size(name: str) -> int:
+            key = f"v{diffcache.CACHE_VERSION}:{name}:{name}"
+            return len(key) + len(json.dumps(hunks))
+
+        clock = itertools.count(1000)
+        with mock.patch.object(diffcache.time, "time", lambda: next(clock)):
+            cache = DiffCache(self.cache_path, max_bytes=int(entry_size("a") * 2.5))
+            for name in ("a", "b"):
+                cache.hunks(name, name, lambda: hunks)
+                cache.flush()
+            cache.hunks("a", "a", lambda: self.fail("a is cached"))
+            cache.flush()  # a is now more recent than b
+            cache.hunks("c", "c", lambda: hunks)
+            cache.flush()
+
+        keys = {key for (key,) in cache._db().execute("SELECT key FROM diffs")}
+        self.assertEqual(keys, {f"v{diffcache.CACHE_VERSION}:{n}:{n}" for n in ("a", "c")})
+
+
+if __name__ == "__main__":
+    unittest.main()
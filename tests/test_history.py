@@ -0,0 +1,39 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.history date ranges over synthetic snapshots.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.history import HistoryIndex, _parse_when
+
+
+class ChangesRangeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        for i, name in enumerate(["250701-100000", "250702-100000", "250703-100000"]):
+            (root / name).mkdir()
+            (root / name / "https_site_test_news.txt").write_text(f"revision {i}")
+        self.index = HistoryIndex(root / ".cache" / "history.sqlite")
+        self.index.index_snapshots(root)
+
+    def test_bare_until_date_includes_that_day(self):
+        since, until = _parse_when("2025-07-02"), _parse_when("2025-07-03", end_of_day=True)
+        snapshots = [change["snapshot"] for change in self.index.changes(since, until)]
+        self.assertEqual(snapshots, ["250702-100000", "250703-100000"])
+
+    def test_exact_until_is_kept(self):
+        since, until = _parse_when("2025-07-02"), _parse_when("250703-095959", end_of_day=True)
+        snapshots = [change["snapshot"] for change in self.index.changes(since, until)]
+        self.assertEqual(snapshots, ["250702-100000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.metrics Prometheus exposition: metric types match how values move.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import unittest
+
+from utils.metrics import RunMetrics, render_prometheus
+
+
+def types(text: str) -> dict[str, str]:
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE"))
+
+
+class PrometheusTest(unittest.TestCase):
+    def test_levels_are_gauges_and_totals_are_counters(self):
+        metrics = RunMetrics(labels={"site": "site.test"})
+        metrics.incr("pages_done")
+        metrics.set_gauge("pages_queued", 12)
+        metrics.set_gauge("pages_queued", 3)
+        metrics.set_gauge("pages_deferred", 4)
+        metrics.observe("navigate_seconds", 0.3)
+
+        text = render_prometheus([metrics])
+        self.assertEqual(
+            types(text),
+            {
+                "wix_scraper_pages_done": "counter",
+                "wix_scraper_pdfs_downloaded": "counter",
+                "wix_scraper_retries": "counter",
+                "wix_scraper_failures": "counter",
+                "wix_scraper_pages_queued": "gauge",
+                "wix_scraper_pages_deferred": "gauge",
+                "wix_scraper_navigate_seconds": "histogram",
+            },
+        )
+        self.assertIn('wix_scraper_pages_queued{site="site.test"} 3', text)
+        self.assertIn("queued=3,", metrics.summary_line())
+
+
+if __name__ == "__main__":
+    unittest.main()
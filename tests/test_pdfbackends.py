@@ -0,0 +1,126 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.multimedia.pdfbackends on hand-built PDFs that use what real generators emit and
+bench.site.make_pdf does not: words placed with TJ offsets instead of space glyphs, and text
+drawn by (nested) Form XObjects.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.multimedia.pdfbackends import PDFExtractor, PdfminerBackend
+
+
+def build_pdf(pages: list[bytes], forms: list[bytes] = ()) -> bytes:
+    """PDF 1.4 with one Helvetica font (/F1) and the given raw content stream per page.
+
+    forms[i] becomes Form XObject /Fm<i>; pages may draw any of them, and a form may draw the
+    forms after it (nesting).
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    first_form = len(objects) + 1
+
+    def resources(start: int) -> bytes:
+        xobjects = b" ".join(
+            b"/Fm%d %d 0 R" % (i, first_form + i) for i in range(start, len(forms))
+        )
+        return b"<< /Font << /F1 3 0 R >> /XObject << %s >> >>" % xobjects
+
+    for i, stream in enumerate(forms):
+        objects.append(
+            b"<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] /Resources %s /Length %d >>"
+            b"\nstream\n%s\nendstream" % (resources(i + 1), len(stream), stream)
+        )
+    kids = []
+    for stream in pages:
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources %s /Contents %d 0 R >>" % (resources(0), len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+# Words positioned with TJ gaps (-250/1000 em), plus tight kerning inside "Border" and "closure".
+KERNED = build_pdf(
+    [
+        b"BT /F1 12 Tf 50 700 Td [(Bor) 15 (der) -250 (clo) -20 (sure) -250 (announced)] TJ ET\n"
+        b"BT /F1 12 Tf 50 680 Td [(Second) -300 (line,) -250 (with) ( ) (a space glyph)] TJ ET"
+    ]
+)
+
+
+class WordSpacingTest(unittest.TestCase):
+    def extract(self, backend: PdfminerBackend) -> list[str]:
+        return [extract() for _, extract in backend.pages(KERNED)]
+
+    def test_tj_gaps_become_spaces(self):
+        self.assertEqual(
+            self.extract(PdfminerBackend()),
+            ["Border closure announced\nSecond line, with a space glyph"],
+        )
+
+    def test_matches_layout_analysis(self):
+        fast = self.extract(PdfminerBackend())[0].split()
+        layout = self.extract(PdfminerBackend(layout=True))[0].split()
+        self.assertEqual(fast, layout)
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.extractor = PDFExtractor("pdfminer", cache_dir=Path(self.tmp.name))
+
+    def test_unchanged_pages_come_from_cache(self):
+        first = self.extractor.extract(KERNED)
+        second = self.extractor.extract(KERNED)
+        self.assertEqual((first.cached, second.cached), (0, 1))
+        self.assertEqual(first.pages, second.pages)
+
+    def test_form_xobject_change_is_not_served_from_cache(self):
+        page = b"BT /F1 12 Tf 50 700 Td (Deadline is) Tj ET /Fm0 Do"
+        date = b"BT /F1 12 Tf 120 700 Td (%s) Tj ET"
+        march = self.extractor.extract(build_pdf([page], [date % b"March 1"]))
+        april = self.extractor.extract(build_pdf([page], [date % b"April 9"]))
+        self.assertEqual(march.pages, ["Deadline is March 1"])
+        self.assertEqual((april.cached, april.pages), (0, ["Deadline is April 9"]))
+
+    def test_nested_form_xobject_change_is_not_served_from_cache(self):
+        page = b"BT /F1 12 Tf 50 700 Td (Deadline is) Tj ET /Fm0 Do"
+        outer = b"/Fm1 Do"
+        date = b"BT /F1 12 Tf 120 700 Td (%s) Tj ET"
+        march = self.extractor.extract(build_pdf([page], [outer, date % b"March 1"]))
+        april = self.extractor.extract(build_pdf([page], [outer, date % b"April 9"]))
+        self.assertEqual(march.pages, ["Deadline is March 1"])
+        self.assertEqual((april.cached, april.pages), (0, ["Deadline is April 9"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.pipeline forcing rules on the real compare -> summarize -> email chain, with stand-in stage
+bodies: re-summarizing must not stack a second summary on the diff report, and a report Gmail
+refused is not stamped as sent.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils import pipeline
+from utils.diffscripts import diffgen
+
+
+def fake_compare(ctx: pipeline.PipelineContext, site: str = ""):
+    path = ctx.diff_file(site)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("--- detailed diff ---\n")
+
+
+def fake_summarize(ctx: pipeline.PipelineContext, site: str = ""):
+    path = ctx.diff_file(site)
+    path.write_text("SUMMARY\n" + path.read_text())
+
+
+class ForceSummarizeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        for name in ("250101-100000", "250108-100000"):
+            (self.root / name).mkdir()
+        for patch in (
+            mock.patch.object(diffgen, "RESULTS_ROOT", self.root),
+            mock.patch.object(pipeline, "_run_compare", fake_compare),
+            mock.patch.object(pipeline, "_run_summarize", fake_summarize),
+            mock.patch.object(pipeline, "_run_email", lambda ctx, site="": None),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def run_pipeline(self, force: set[str]) -> tuple[dict[str, str], Path]:
+        ctx = pipeline.PipelineContext(
+            results_root=self.root,
+            old_dir=self.root / "250101-100000",
+            new_dir=self.root / "250108-100000",
+        )
+        stages = [s for s in pipeline.build_stages() if s.name not in ("scrape", "index")]
+        for stage in stages:
+            stage.deps = tuple(d for d in stage.deps if d != "scrape")
+        status = asyncio.run(pipeline.run_pipeline(stages, ctx, force=force))
+        return status, ctx.diff_file()
+
+    def test_forcing_summarize_regenerates_the_report_first(self):
+        self.run_pipeline(set())
+        status, report = self.run_pipeline({"summarize"})
+        self.assertEqual(status, {"compare": "ran", "summarize": "ran", "email": "ran"})
+        self.assertEqual(report.read_text().count("SUMMARY"), 1)
+
+    def test_fresh_chain_is_skipped(self):
+        self.run_pipeline(set())
+        status, report = self.run_pipeline(set())
+        self.assertEqual(status, {"compare": "fresh", "summarize": "fresh", "email": "fresh"})
+        self.assertEqual(report.read_text().count("SUMMARY"), 1)
+
+
+class EmailStampTest(unittest.TestCase):
+    def test_unsent_email_is_not_stamped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for name in ("250101-100000", "250108-100000"):
+                (root / name).mkdir()
+            ctx = pipeline.PipelineContext(
+                results_root=root, old_dir=root / "250101-100000", new_dir=root / "250108-100000"
+            )
+            email = next(s for s in pipeline.build_stages() if s.name == "email")
+            email.deps = ()
+            with (
+                mock.patch.object(diffgen, "RESULTS_ROOT", root),
+                mock.patch("utils.send_email.gmail_send_message", return_value=None),
+            ):
+                status = asyncio.run(pipeline.run_pipeline([email], ctx))
+            self.assertEqual(status, {"email": "failed"})
+            self.assertFalse(ctx.stamp(email).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.revisit on synthetic snapshot histories: PDF priorities and carrying forward PDFs and
+hash-suffixed page files.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from utils.revisit import REVISIT_MARKER, RevisitModel, carry_forward
+from utils.snapshots import RUN_REPORT
+
+PDF_URL = "https://site.test/docs/a.pdf"
+PAGE_URL = "https://site.test/about"
+CLASH_URL = "https://site.test/a_b"  # ambiguous once sanitised, so its name carries a hash
+CLASH_FILE = "https_site_test_a_b-ac6426afb0bc.txt"
+SNAPSHOTS = ["250101-100000", "250108-100000", "250115-100000"]
+
+
+class RevisitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        pages = {
+            PDF_URL: {"file": "a.pdf.txt", "pdf": "a.pdf"},
+            PAGE_URL: {"file": "https_site_test_about.txt"},
+            CLASH_URL: {"file": CLASH_FILE},
+        }
+        for i, name in enumerate(SNAPSHOTS):
+            snapshot = self.root / name
+            (snapshot / "pdf").mkdir(parents=True)
+            (snapshot / "pdf" / "a.pdf").write_bytes(b"%PDF unchanged")
+            (snapshot / "a.pdf.txt").write_text("unchanged")
+            (snapshot / "https_site_test_about.txt").write_text(f"revision {i}")
+            (snapshot / CLASH_FILE).write_text("unchanged")
+            (snapshot / RUN_REPORT).write_text(json.dumps({"pages": pages}))
+        self.model = RevisitModel.learn(self.root)
+        self.model.now = datetime(2025, 1, 16, 10)
+
+    def test_unchanged_pdf_has_low_priority(self):
+        self.assertLess(self.model.priority(PDF_URL), 0.05)
+        self.assertGreater(self.model.priority(PAGE_URL), 0.1)
+        self.assertEqual(self.model.priority("https://site.test/new"), 1.0)
+
+    def test_carry_forward_copies_the_urls_files(self):
+        out_dir = self.root / "250122-100000.partial"
+        out_dir.mkdir()
+        carried = carry_forward({PDF_URL, CLASH_URL}, self.root / SNAPSHOTS[-1], out_dir)
+        self.assertCountEqual(carried, ["a.pdf", "a.pdf.txt", CLASH_FILE])
+        self.assertTrue((out_dir / "pdf" / "a.pdf").is_file())
+        self.assertTrue((out_dir / CLASH_FILE).is_file())
+
+        marker = json.loads((out_dir / REVISIT_MARKER).read_text(encoding="utf-8"))
+        self.assertEqual(marker["deferred"], sorted([PDF_URL, CLASH_URL]))
+        self.assertEqual(self.model.known_urls, [PDF_URL, PAGE_URL, CLASH_URL])
+
+
+if __name__ == "__main__":
+    unittest.main()
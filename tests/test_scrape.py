@@ -0,0 +1,243 @@
+"""
+PATH: ./wix-scraper/tests/
+
+Drives utils.scrape.main end to end against an in-memory site (a fake Playwright: browser,
+contexts, pages and the PDF request API), so the crawl -> staging dir -> commit path runs
+without Chromium or a network.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urljoin
+
+from bench.site import make_pdf
+from utils import scrape
+from utils.configs.config import SiteConfig
+from utils.snapshots import (
+    COMPLETE_MARKER,
+    MANIFEST,
+    RUN_REPORT,
+    PageEvent,
+    SnapshotNotCommitted,
+    check_committed,
+    staging_dir,
+)
+
+START_URL = "https://site.test/"
+PAGES = {
+    "https://site.test/": ("Home\nWelcome", ["/about", "/files/report.pdf"]),
+    "https://site.test/about": ("About\nWho we are", ["/", "/news"]),
+    "https://site.test/news": ("News\nBorder closure announced", ["/about"]),
+}
+PDF = make_pdf([["Quarterly report"], ["Page two"]])
+
+
+class FakeResponse:
+    def __init__(self, url: str, body: bytes):
+        self.url = url
+        self.status = 200
+        self.headers = {"content-type": "application/pdf"}
+        self._body = body
+
+    async def body(self) -> bytes:
+        return self._body
+
+
+class FakeRequest:
+    def __init__(self, fetched: list[str]):
+        self.fetched = fetched
+
+    async def get(self, url: str) -> FakeResponse:
+        self.fetched.append(url)
+        return FakeResponse(url, PDF)
+
+
+class FakeFrame:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def evaluate(self, script: str) -> str:
+        return self.text
+
+
+class FakeTabs:
+    async def all(self) -> list:
+        return []
+
+
+class FakePage:
+    def __init__(self):
+        self.url = ""
+        self.frames: list[FakeFrame] = []
+
+    async def goto(self, url: str, **kwargs):
+        self.url = url
+        self.frames = [FakeFrame(PAGES[url][0])]
+
+    async def query_selector(self, selector: str):
+        return None  # no password wall
+
+    async def content(self) -> str:
+        links = "".join(f'<a href="{href}">link</a>' for href in PAGES[self.url][1])
+        return f"<html><body>{links}</body></html>"
+
+    def get_by_role(self, role: str) -> FakeTabs:
+        return FakeTabs()
+
+    async def close(self):
+        pass
+
+
+class FinishedRequest:
+    """A page load that, like most chunked HTML, came without a content-length header."""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    async def sizes(self) -> dict[str, int]:
+        return {"responseBodySize": len(PAGES[self.url][0])}
+
+
+class FakeContext:
+    def __init__(self, visited: list[str], fetched: list[str]):
+        self.visited = visited
+        self.request = FakeRequest(fetched)
+        self.handlers: dict[str, list] = {}
+
+    def on(self, event: str, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    async def new_page(self) -> FakePage:
+        page = FakePage()
+        goto = page.goto
+
+        async def record(url: str, **kwargs):
+            self.visited.append(url)
+            await goto(url, **kwargs)
+            for handler in self.handlers.get("requestfinished", []):
+                await handler(FinishedRequest(url))
+
+        page.goto = record
+        return page
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.visited: list[str] = []
+        self.fetched: list[str] = []
+
+    async def new_context(self) -> FakeContext:
+        return FakeContext(self.visited, self.fetched)
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    def __init__(self, browser: FakeBrowser):
+        self.chromium = self
+        self.browser = browser
+
+    async def launch(self, **kwargs) -> FakeBrowser:
+        return self.browser
+
+    async def __aenter__(self) -> "FakePlaywright":
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class FakeStealth:
+    def __init__(self, playwright: FakePlaywright):
+        self.playwright = playwright
+
+    def use_async(self, manager) -> FakePlaywright:
+        return self.playwright
+
+
+class ScrapeCommitTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.results = Path(self.tmp.name)
+        self.out_dir = self.results / "250101-120000"
+        self.browser = FakeBrowser()
+        playwright = FakePlaywright(self.browser)
+        for patch in (
+            mock.patch.object(scrape, "Stealth", lambda: FakeStealth(playwright)),
+            mock.patch.object(scrape, "async_playwright", lambda: None),
+            mock.patch.object(scrape, "OUT_DIR", self.out_dir),
+            mock.patch.object(scrape, "RESULTS_ROOT", self.results),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    async def test_crawl_commits_snapshot(self):
+        events: asyncio.Queue = asyncio.Queue()
+        await scrape.main(events=events, sites=[SiteConfig(start_url=START_URL)])
+
+        self.assertEqual(sorted(self.browser.visited), sorted(PAGES))
+        self.assertEqual(self.browser.fetched, [urljoin(START_URL, "/files/report.pdf")])
+
+        # Everything was staged, then moved into place in one rename.
+        self.assertFalse(staging_dir(self.out_dir).exists())
+        self.assertTrue(check_committed(self.out_dir))
+        self.assertTrue((self.out_dir / COMPLETE_MARKER).is_file())
+        snapshots = [p.name for p in self.results.iterdir() if not p.name.startswith(".")]
+        self.assertEqual(snapshots, [self.out_dir.name])
+
+        manifest = json.loads((self.out_dir / MANIFEST).read_text(encoding="utf-8"))
+        self.assertEqual(
+            sorted(manifest["files"]),
+            [
+                "https_site_test_.txt",
+                "https_site_test_about.txt",
+                "https_site_test_news.txt",
+                "pdf/report.pdf",
+                "report.pdf.txt",
+            ],
+        )
+        self.assertEqual((self.out_dir / "pdf" / "report.pdf").read_bytes(), PDF)
+        self.assertIn("Quarterly report", (self.out_dir / "report.pdf.txt").read_text())
+
+        # Events point into the staging dir (files are on disk there when they are emitted).
+        staged = []
+        while (event := events.get_nowait()) is not None:
+            self.assertIsInstance(event, PageEvent)
+            staged.append(event.path.relative_to(staging_dir(self.out_dir)).as_posix())
+        self.assertEqual(len(staged), 4)
+        self.assertIn("report.pdf.txt", staged)
+
+        report = json.loads((self.out_dir / RUN_REPORT).read_text(encoding="utf-8"))
+        body_bytes = sum(len(text) for text, _ in PAGES.values())
+        self.assertEqual(report["counters"]["bytes_received"], body_bytes)
+
+    async def test_failed_write_leaves_snapshot_uncommitted(self):
+        write_bytes = Path.write_bytes
+
+        def failing_write(path: Path, data: bytes) -> int:
+            if path.name == "https_site_test_news.txt":
+                raise OSError("No space left on device")
+            return write_bytes(path, data)
+
+        with mock.patch.object(Path, "write_bytes", failing_write):
+            with self.assertRaises(SnapshotNotCommitted):
+                await scrape.main(sites=[SiteConfig(start_url=START_URL)])
+
+        self.assertFalse(self.out_dir.exists())
+        staged = staging_dir(self.out_dir)
+        self.assertTrue((staged / "https_site_test_about.txt").is_file())
+        self.assertFalse((staged / COMPLETE_MARKER).exists())
+        with self.assertRaises(SnapshotNotCommitted):
+            check_committed(staged)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.shard coordinator bookkeeping, without spawning crawlers: incremental metrics pushes,
+worker liveness, refusing to commit after a worker did not finish cleanly, and the journal mode
+workers inherit.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils import shard
+from utils.configs.config import SiteConfig
+from utils.metrics import RunMetrics
+from utils.snapshots import COMPLETE_MARKER, RUN_REPORT, staging_dir
+
+SITE = SiteConfig(start_url="https://site.test/")
+
+
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.out_dir = Path(self.tmp.name) / "250101-120000"
+        self.db_path = Path(self.tmp.name) / "frontier.sqlite"
+        self.db = shard.ShardDB(self.db_path)
+
+    def push(self, worker: str, age: float, finished: bool = False, failed: bool = False):
+        metrics = RunMetrics(labels={"site": "site.test"})
+        metrics.incr("pages_done")
+        self.db.push_metrics(worker, "site.test", metrics.delta(), finished, failed)
+        self.db.conn.execute(
+            "UPDATE metrics SET updated = ? WHERE worker = ?", (time.time() - age, worker)
+        )
+
+    def test_pushes_carry_only_new_pages(self):
+        metrics = RunMetrics(labels={"site": "site.test"})
+        for i in range(3000):
+            metrics.observe("navigate_seconds", 0.5)
+        metrics.record_page("https://site.test/", file="a.txt")
+        self.db.push_metrics("w1", "site.test", metrics.delta())
+        metrics.record_page("https://site.test/about", file="b.txt")
+        report = metrics.delta()
+        self.assertEqual(list(report["pages"]), ["https://site.test/about"])
+        self.assertEqual(len(report["histograms"]["navigate_seconds"]["samples"]), 1024)
+        self.db.push_metrics("w1", "site.test", report, finished=True)
+
+        polled = self.db.merged_metrics()["site.test"]
+        self.assertEqual(polled.pages, {})
+        self.assertEqual(polled.histograms["navigate_seconds"].count, 3000)
+        final = self.db.merged_metrics(pages=True)["site.test"]
+        self.assertEqual(sorted(final.pages), ["https://site.test/", "https://site.test/about"])
+
+    def test_silent_workers_count_as_finished_only_when_asked(self):
+        self.push("done", age=0, finished=True)
+        self.push("dead", age=600)
+        self.assertFalse(self.db.workers_finished())
+        self.assertTrue(self.db.workers_finished(max_silence=60))
+        self.assertEqual(self.db.silent_workers(60), ["dead"])
+
+        self.push("live", age=1)
+        self.assertFalse(self.db.workers_finished(max_silence=60))
+
+    def drain_frontier(self):
+        self.db.conn.execute(
+            "INSERT INTO urls (site, url, shard, state) VALUES (?, ?, 0, 'done')",
+            ("site.test", "https://site.test/"),
+        )
+
+    def coordinate(self, spawn: bool = False):
+        with mock.patch.object(shard, "POLL_SECONDS", 0.01):
+            thread = threading.Thread(
+                target=shard.coordinate,
+                args=(1, [SITE], self.out_dir),
+                kwargs={"spawn": spawn, "db_path": self.db_path},
+                daemon=True,
+            )
+            thread.start()
+            thread.join(timeout=30)
+        self.assertFalse(thread.is_alive(), "coordinator is still waiting")
+
+    def test_clean_no_spawn_run_is_committed(self):
+        self.drain_frontier()
+        self.push("w1", age=0, finished=True)
+        self.coordinate()
+        self.assertTrue((self.out_dir / COMPLETE_MARKER).is_file())
+        self.assertTrue((self.out_dir / RUN_REPORT).is_file())
+
+    def test_no_spawn_coordinator_does_not_wait_for_a_dead_worker(self):
+        # The frontier was drained by the survivors; "dead" never pushed finished=1, and any
+        # PDFs or writes it still had queued are gone, so the run is reported but not committed.
+        self.drain_frontier()
+        self.push("alive", age=0, finished=True)
+        self.push("dead", age=600)
+        self.coordinate()
+        self.assertFalse(self.out_dir.exists())
+        self.assertTrue((staging_dir(self.out_dir) / RUN_REPORT).is_file())
+
+    def test_failed_worker_blocks_the_commit(self):
+        self.drain_frontier()
+        self.push("alive", age=0, finished=True)
+        self.push("crashed", age=0, failed=True)
+        self.assertTrue(self.db.workers_finished())
+        self.assertEqual(self.db.failed_workers(), ["crashed"])
+        self.coordinate()
+        self.assertFalse(self.out_dir.exists())
+
+    def test_non_zero_exit_blocks_the_commit(self):
+        # Killed after the frontier drained (e.g. OOM while PDFs were still queued): no
+        # metrics push says so, only the exit code.
+        self.drain_frontier()
+        self.push("w0", age=0, finished=True)
+        worker = mock.Mock(**{"poll.return_value": -9})
+        with mock.patch.object(shard, "_spawn", return_value=worker) as spawn:
+            self.coordinate(spawn=True)
+        spawn.assert_called_once()  # nothing left to crawl, so no restart
+        self.assertFalse(self.out_dir.exists())
+        self.assertTrue((staging_dir(self.out_dir) / RUN_REPORT).is_file())
+
+    def test_workers_keep_the_coordinators_journal_mode(self):
+        self.assertEqual(self.db.journal_mode, "wal")
+        shared = Path(self.tmp.name) / "shared.sqlite"
+        coordinator = shard.ShardDB(shared, "DELETE")
+        self.assertEqual(coordinator.journal_mode, "delete")
+        worker = shard.ShardDB(shared, journal_mode=None)
+        self.assertEqual(worker.journal_mode, "delete")
+        self.assertEqual(shard.ShardDB(self.db_path, journal_mode=None).journal_mode, "wal")
+
+
+if __name__ == "__main__":
+    unittest.main()
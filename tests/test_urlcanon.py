@@ -0,0 +1,74 @@
+"""
+PATH: ./wix-scraper/tests/
+
+utils.urlcanon trap detection (calendar views are rejected, dated content pages are not) and
+snapshot filenames.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import unittest
+
+from utils.urlcanon import TrapDetector, url_to_filename
+
+
+class TrapPatternTest(unittest.TestCase):
+    def test_calendar_views_are_rejected(self):
+        for url in (
+            "https://site.test/events/2024-05-01",
+            "https://site.test/events/2024-05-01/",
+            "https://site.test/calendar/2024-05",
+            "https://site.test/events/day/2024-05-01?view=list",
+            "https://site.test/events?date=2024-05",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(TrapDetector().check(url), "pattern")
+
+    def test_dated_content_pages_are_kept(self):
+        for url in (
+            "https://site.test/events/2024-05-spring-gala",
+            "https://site.test/event-details/2024-05-01-open-day",
+            "https://site.test/blog/2024-05-01",
+        ):
+            with self.subTest(url=url):
+                self.assertIsNone(TrapDetector().check(url))
+
+    def test_rejection_is_remembered(self):
+        traps = TrapDetector(template_cap=1)
+        self.assertIsNone(traps.check("https://site.test/page/1"))
+        self.assertEqual(traps.check("https://site.test/page/2"), "template_cap")
+        self.assertEqual(traps.check("https://site.test/page/2"), "template_cap")
+        self.assertIsNone(traps.check("https://site.test/page/1"))
+
+
+class FilenameTest(unittest.TestCase):
+    def test_ordinary_paths_keep_their_plain_names(self):
+        self.assertEqual(url_to_filename("https://site.test/"), "https_site_test_")
+        self.assertEqual(url_to_filename("https://site.test/about"), "https_site_test_about")
+        self.assertEqual(
+            url_to_filename("https://site.test/blog/post-1"), "https_site_test_blog_post-1"
+        )
+
+    def test_urls_that_sanitise_alike_get_distinct_stable_names(self):
+        urls = [
+            "https://site.test/a/b",
+            "https://site.test/a_b",
+            "https://site.test/a.b",
+            "https://site.test/a//b",
+            "https://site.test/a?b",
+        ]
+        names = [url_to_filename(url) for url in urls]
+        self.assertEqual(len(set(names)), len(urls))
+        # No registry, no crawl order: the same URL gets the same name in any run or process.
+        self.assertEqual(names, [url_to_filename(url) for url in reversed(urls)][::-1])
+        self.assertEqual(names[0], "https_site_test_a_b")
+        self.assertRegex(names[1], r"^https_site_test_a_b-[0-9a-f]{12}$")
+
+    def test_long_names_are_cut_and_hashed(self):
+        name = url_to_filename("https://site.test/" + "x" * 300)
+        self.assertLessEqual(len(name), 180)
+        self.assertRegex(name, r"-[0-9a-f]{12}$")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,15 +7,20 @@ Functions:
 - is_timestamped_dir(name): Returns True if the given directory name matches the YYYYMMDD-HHMMSS timestamp format.
 - run_comparison(dir1, dir2): Confirms timestamp sort order and prompts user for comparison approval.
 - main(old_dir, new_dir): Executes hashing and diff generation between the given directories.
-- cli(): CLI interface for directory input, comparison validation, and main execution call.
+  Refuses uncommitted (<ts>.partial) snapshots and warns about ones without a .complete marker.
+- cli(argv): CLI interface for directory input, comparison validation, and main execution call.
 """
 
-
-import re, argparse, logging
+import argparse
+import logging
+import re
 from pathlib import Path
-from utils.configs.config import setup_logger
+
+from utils.configs.logs import setup_logger
+from utils.diffscripts.diffgen import diff_report_path, generate_diff_report
 from utils.diffscripts.hashcomparator import hash_and_compare
-from utils.diffscripts.diffgen import generate_diff_report
+from utils.profiling import add_profile_args, mark_stage, profiled
+from utils.snapshots import SnapshotNotCommitted, check_committed
 from utils.yn import prompt_yes_no
 
 lgg = setup_logger(logging.INFO)
@@ -39,8 +44,12 @@ def run_comparison(dir1: Path, dir2: Path) -> tuple[Path, Path] | None:
 
     if is_timestamped_dir(base1_input) and is_timestamped_dir(base2_input):
         if base1_input > base2_input:
-            lgg.w(f"'{base1_input}' appears newer than '{base2_input}', but was passed as the OLD directory.")
-            if not prompt_yes_no("Would you like to auto-sort them (older first) before proceeding?"):
+            lgg.w(
+                f"'{base1_input}' appears newer than '{base2_input}', but was passed as the OLD directory."
+            )
+            if not prompt_yes_no(
+                "Would you like to auto-sort them (older first) before proceeding?"
+            ):
                 lgg.i("Operation cancelled.")
                 return None
             lgg.i(f"Auto-sorting directories: {base2_input} (OLD), {base1_input} (NEW)")
@@ -55,26 +64,42 @@ def run_comparison(dir1: Path, dir2: Path) -> tuple[Path, Path] | None:
 
 
 def main(old_dir: Path, new_dir: Path) -> None:
+    check_committed(old_dir)  # raises SnapshotNotCommitted for a half-written crawl
+    check_committed(new_dir)
     differences, added_files, removed_files = hash_and_compare(str(old_dir), str(new_dir))
+    mark_stage("hashed")
     generate_diff_report(differences, added_files, removed_files, str(old_dir), str(new_dir))
 
 
-def cli():
+def cli(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="Execution handler for hash & diff tools.")
     parser.add_argument("olddir", nargs="?", help="Old directory (positional)")
     parser.add_argument("newdir", nargs="?", help="New directory (positional)")
-    args = parser.parse_args()
-
-    dir1 = Path(args.olddir).resolve() if args.olddir else get_directory_input("Enter path to OLD directory")
-    dir2 = Path(args.newdir).resolve() if args.newdir else get_directory_input("Enter path to NEW directory")
+    add_profile_args(parser)
+    args = parser.parse_args(argv)
+
+    dir1 = (
+        Path(args.olddir).resolve()
+        if args.olddir
+        else get_directory_input("Enter path to OLD directory")
+    )
+    dir2 = (
+        Path(args.newdir).resolve()
+        if args.newdir
+        else get_directory_input("Enter path to NEW directory")
+    )
 
     sorted_dirs = run_comparison(dir1, dir2)
     if not sorted_dirs:
         return
 
     old_dir, new_dir = sorted_dirs
-    main(old_dir, new_dir)
-
+    profile_dir = args.profile_dir or diff_report_path(old_dir, new_dir).parent
+    with profiled(args.profile, profile_dir, "compare"):
+        try:
+            main(old_dir, new_dir)
+        except SnapshotNotCommitted as e:
+            lgg.er(str(e))
 
 
 if __name__ == "__main__":
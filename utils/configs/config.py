@@ -1,45 +1,109 @@
-import logging
+import json
+from functools import cache
+from pathlib import Path
+from typing import TypeVar
 
-from pydantic import EmailStr
+from pydantic import BaseModel, EmailStr
 from pydantic_settings import BaseSettings
 
+from utils.configs.logs import LggWrapper, setup_logger  # noqa: F401  (re-exported)
+from utils.urlcanon import DEFAULT_STRIP_PARAMS, DEFAULT_TRAP_PATTERNS, canonicalize
 
-class Settings(BaseSettings):
+
+class SiteConfig(BaseModel):
     start_url: str
+    wix_password: str = ""
+    url_blacklist: list[str] = [""]
+    out_subdir: str = ""  # "" writes straight into results/<timestamp>/
+
+
+class _EnvSettings(BaseSettings):
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"  # one .env serves every command; each view reads only its own keys
+
+
+class CrawlSettings(_EnvSettings):
+    start_url: str = ""
     url_blacklist: list[str] = [""]
     wix_password: str = ""
+    sites: list[SiteConfig] = []  # SITES='[{"start_url": "...", "out_subdir": "korame"}, ...]'
+    sites_file: str = ""  # JSON file holding the same list as SITES
+    crawl_concurrency: int = 5  # page workers shared by every site in the run
+    metrics_port: int = 0  # serve Prometheus text on 127.0.0.1:<port>/metrics while crawling
+    url_strip_params: list[str] = DEFAULT_STRIP_PARAMS  # query params (globs) dropped from links
+    url_lowercase_path: bool = True  # Wix paths are case-insensitive
+    url_max_depth: int = 8  # path segments; 0 = unlimited
+    url_template_cap: int = 100  # pages per path template (/blog/page/{n}); 0 = unlimited
+    url_trap_patterns: list[str] = DEFAULT_TRAP_PATTERNS  # regexes that reject a link outright
+    revisit: bool = False  # fetch pages most likely to have changed first (utils.revisit)
+    revisit_history: int = 30  # snapshots the per-page change rates are learned from
+    revisit_max_pages: int = 0  # per-site page budget for one run; 0 = unlimited
+    revisit_max_minutes: float = 0  # per-site time budget for one run; 0 = unlimited
+    # pdfminer, pdfminer-layout, pymupdf or auto (utils.multimedia.pdfbackends). Explicit, so
+    # installing PyMuPDF does not silently change every PDF sidecar.
+    pdf_backend: str = "pdfminer"
+    pdf_max_pages: int = 0  # pages extracted per PDF; 0 = all
+
+    def canonicalize(self, url: str) -> str:
+        return canonicalize(url, self.url_strip_params, self.url_lowercase_path)
+
+    def site_configs(self, sites_file: str | None = None) -> list[SiteConfig]:
+        """SITES / SITES_FILE if given, otherwise the single START_URL site."""
+        sites_file = sites_file or self.sites_file
+        if sites_file:
+            raw = json.loads(Path(sites_file).read_text(encoding="utf-8"))
+            sites = [SiteConfig(**site) for site in raw]
+        elif self.sites:
+            sites = list(self.sites)
+        elif self.start_url:
+            sites = [
+                SiteConfig(
+                    start_url=self.start_url,
+                    wix_password=self.wix_password,
+                    url_blacklist=self.url_blacklist,
+                )
+            ]
+        else:
+            raise ValueError("Set START_URL, SITES or SITES_FILE to choose what to crawl.")
+
+        if len(sites) > 1:
+            subdirs = [site.out_subdir for site in sites]
+            if not all(subdirs) or len(set(subdirs)) != len(subdirs):
+                raise ValueError("Multi-site runs need a unique, non-empty out_subdir per site.")
+        return sites
+
+
+class EmailSettings(_EnvSettings):
     email_to: list[EmailStr] = ["test@test.com"]
     email_from: EmailStr = "test@test.com"
     email_subject: str = ""
     email_body: str = ""
     credentials_file: str = "credentials.json"
     token_file: str = "token.json"
+
+
+class SummarySettings(_EnvSettings):
     openai_api_key: str = ""
     openai_model_version: str = "gpt-4o-mini"
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+
+class Settings(CrawlSettings, EmailSettings, SummarySettings):
+    """Every setting; commands should ask get_settings() for the narrowest view they need."""
 
 
-# one global instance you import everywhere
-settings = Settings()
+S = TypeVar("S", bound=BaseSettings)
 
 
-class LggWrapper:
-    def __init__(self, logger):
-        self.em = logger.critical  # EMERGENCY (mapped to CRITICAL)
-        self.a = logger.critical  # ALERT     (same as critical)
-        self.c = logger.critical  # CRITICAL
-        self.er = logger.error  # ERROR
-        self.w = logger.warning  # WARNING
-        self.n = logger.info  # NOTICE (mapped to INFO)
-        self.i = logger.info  # INFO
-        self.d = logger.debug  # DEBUG
+@cache
+def get_settings(view: type[S] = Settings) -> S:
+    """Reads the environment / .env on first use, once per view."""
+    return view()
 
 
-def setup_logger(level=logging.INFO) -> LggWrapper:
-    logging.basicConfig(
-        level=level, format="[%(levelname)s] %(message)s", handlers=[logging.StreamHandler()]
-    )
-    return LggWrapper(logging.getLogger())
+def __getattr__(name: str):
+    # `from utils.configs.config import settings` keeps working, but only pays on first use.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,31 @@
+"""
+PATH: ./wix-scraper/utils/configs/
+
+Logging helpers, kept apart from config.py so light commands (compare, hashing, diffing) can log
+without importing pydantic.
+
+Functions:
+- LggWrapper(logger): Short aliases (lgg.i / lgg.w / lgg.er ...) for a logger's level methods.
+- setup_logger(level): Configures root logging once and returns it wrapped in LggWrapper.
+"""
+
+import logging
+
+
+class LggWrapper:
+    def __init__(self, logger):
+        self.em = logger.critical  # EMERGENCY (mapped to CRITICAL)
+        self.a = logger.critical  # ALERT     (same as critical)
+        self.c = logger.critical  # CRITICAL
+        self.er = logger.error  # ERROR
+        self.w = logger.warning  # WARNING
+        self.n = logger.info  # NOTICE (mapped to INFO)
+        self.i = logger.info  # INFO
+        self.d = logger.debug  # DEBUG
+
+
+def setup_logger(level=logging.INFO) -> LggWrapper:
+    logging.basicConfig(
+        level=level, format="[%(levelname)s] %(message)s", handlers=[logging.StreamHandler()]
+    )
+    return LggWrapper(logging.getLogger())
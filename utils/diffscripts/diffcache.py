@@ -0,0 +1,131 @@
+"""
+PATH: ./wix-scraper/utils/diffscripts/
+
+Persistent cache of diff hunks keyed by the (old, new) content hashes of a file pair.
+
+diffgen.diff_file asks the cache before running SequenceMatcher. Hunks hold only tags, page
+numbers and line ranges, never labels or text, so one entry serves every file, snapshot pair and
+report layout with the same two contents: re-running compare only reads files and renders. Within
+a run, identical pairs (boilerplate pages that changed the same way) are diffed once and served
+from memory. New entries and hit timestamps are written in one transaction by flush(), which also
+evicts least-recently-used entries once the database outgrows max_bytes.
+
+Functions:
+- DiffCache(path, max_bytes): hunks(old_hash, new_hash, compute) -> cached or freshly computed
+  hunks; flush() persists them and evicts.
+- default_cache(): The process-wide cache at results/.cache/diffs.sqlite, sized by DIFF_CACHE_MB
+  (default 64; 0 disables it).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
+
+from utils.configs.logs import setup_logger
+from utils.snapshots import RESULTS_ROOT
+
+lgg = setup_logger(logging.INFO)
+
+DIFF_CACHE = ".cache/diffs.sqlite"  # under the results root
+# Bump when the hunk format or the diff algorithm changes; older entries then age out.
+CACHE_VERSION = 1
+EVICT_TO = 0.9  # fraction of max_bytes left after an eviction pass
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diffs (
+    key TEXT PRIMARY KEY,  -- v<version>:<old sha256>:<new sha256>
+    hunks TEXT NOT NULL,  -- JSON list of [tag, page1, page2, i1, i2, j1, j2]
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS diffs_used ON diffs (used);
+"""
+
+
+class DiffCache:
+    def __init__(self, path: Path, max_bytes: int = 64 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memo: dict[str, list] = {}  # this run's hunks, cached or computed
+        self.new: dict[str, str] = {}  # key -> JSON, not yet in the database
+        self.used: set[str] = set()  # database hits whose timestamp needs bumping
+        self.hits = self.memo_hits = self.misses = 0
+        self._lock = threading.Lock()  # streaming diffs run on worker threads
+        self._conn: sqlite3.Connection | None = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def hunks(self, old_hash: str, new_hash: str, compute: Callable[[], list]) -> list:
+        key = f"v{CACHE_VERSION}:{old_hash}:{new_hash}"
+        with self._lock:
+            if key in self.memo:
+                self.memo_hits += 1
+                return self.memo[key]
+            row = self._db().execute("SELECT hunks FROM diffs WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.hits += 1
+                self.used.add(key)
+                self.memo[key] = json.loads(row[0])
+                return self.memo[key]
+
+        hunks = compute()  # outside the lock, so different pairs are diffed in parallel
+        with self._lock:
+            self.misses += 1
+            self.memo[key] = hunks
+            self.new[key] = json.dumps(hunks)
+        return hunks
+
+    def flush(self):
+        with self._lock:
+            if self.hits or self.memo_hits or self.misses:
+                lgg.i(
+                    f"Diff cache: {self.hits} hits, {self.memo_hits} in-run duplicates, "
+                    f"{self.misses} diffed"
+                )
+            if self.new or self.used:
+                now = time.time()
+                conn = self._db()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO diffs VALUES (?, ?, ?, ?)",
+                        [(k, v, len(k) + len(v), now) for k, v in self.new.items()],
+                    )
+                    conn.executemany(
+                        "UPDATE diffs SET used = ? WHERE key = ?", [(now, k) for k in self.used]
+                    )
+                    self._evict(conn)
+            self.memo.clear()
+            self.new.clear()
+            self.used.clear()
+            self.hits = self.memo_hits = self.misses = 0
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM diffs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess, victims = total - int(self.max_bytes * EVICT_TO), []
+        for key, size in conn.execute("SELECT key, size FROM diffs ORDER BY used").fetchall():
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM diffs WHERE key = ?", victims)
+        lgg.i(f"Diff cache: evicted {len(victims)} least recently used entries")
+
+
+@cache
+def default_cache() -> DiffCache | None:
+    mb = float(os.environ.get("DIFF_CACHE_MB") or 64)
+    return DiffCache(RESULTS_ROOT / DIFF_CACHE, int(mb * 2**20)) if mb > 0 else None
@@ -2,15 +2,30 @@
 PATH: ./wix-scraper/utils/diffscripts/
 
 Functions:
-- generate_diff_report(changed_files, added_files, removed_files, dir1, dir2):
+- diff_report_path(dir1, dir2): Returns the exports path the diff report for dir1 -> dir2 is written to.
+- diff_hunks(lines1, lines2): Returns the non-equal SequenceMatcher hunks of two files' lines.
+  PDF sidecars with page markers are aligned page by page first, and hunks name their page.
+- diff_file(filename, dir1_path, dir2_path, cache): Returns the line-by-line diff block for one
+  changed file; with a DiffCache (utils.diffscripts.diffcache) the hunks come from the cache
+  when this content pair was diffed before.
+- generate_diff_report(changed_files, added_files, removed_files, dir1, dir2, precomputed,
+  cache):
   Compares matching files line-by-line and outputs a diff report, including added and removed files.
+  Blocks already computed (e.g. by the streaming differ) can be passed in via `precomputed`.
+  `cache` defaults to diffcache.default_cache().
 """
 
 import logging
-from pathlib import Path
 from difflib import SequenceMatcher
+from hashlib import sha256
+from io import StringIO
+from pathlib import Path
 from shutil import copy2
-from utils.configs.config import setup_logger
+
+from utils.configs.logs import setup_logger
+from utils.diffscripts.diffcache import DiffCache, default_cache
+from utils.multimedia.pdfbackends import PAGE_MARKER_RE, split_pages
+from utils.snapshots import RESULTS_ROOT, snapshot_label, split_snapshot
 
 lgg = setup_logger(logging.INFO)
 
@@ -43,64 +58,159 @@ def export_file(file: str, src_dir: Path, dst_root: Path):
         lgg.i(f"Failed to export '{file}': {e}")
 
 
-def generate_diff_report(changed_files, added_files, removed_files, dir1, dir2):
-    dir1_path = Path(dir1).resolve()
-    dir2_path = Path(dir2).resolve()
+def diff_report_path(dir1, dir2) -> Path:
+    # Per-site snapshots (results/<ts>/<site>) export to results/exports/<ts>/<site>/.
+    root1, _ = split_snapshot(dir1)
+    root2, site = split_snapshot(dir2)
+    exports_dir = RESULTS_ROOT / "exports" / root2.name / site
+    return exports_dir / f"{root1.name}_{root2.name}.diff.txt"
 
-    name1 = dir1_path.name
-    name2 = dir2_path.name
-    filename_out = f"{name1}_{name2}.diff.txt"
 
-    export_folder_name = name2
-    project_root = Path(__file__).resolve().parents[2]
-    exports_dir = project_root / "results" / "exports" / export_folder_name
-    exports_dir.mkdir(parents=True, exist_ok=True)
+# (tag, old page, new page, i1, i2, j1, j2): line ranges are within the page when it has one.
+Hunk = tuple[str, int | None, int | None, int, int, int, int]
 
-    output_file = exports_dir / filename_out
 
-    with output_file.open("w", encoding="utf-8") as out:
-        for filename in changed_files:
-            file1_path = dir1_path / filename
-            file2_path = dir2_path / filename
+def _line_hunks(lines1, lines2, page1=None, page2=None) -> list[Hunk]:
+    matcher = SequenceMatcher(None, lines1, lines2)
+    return [
+        (tag, page1, page2, i1, i2, j1, j2)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _is_paged(lines1, lines2) -> bool:
+    # Both sides need page markers; against an older sidecar the pages cannot be lined up.
+    return all(lines and PAGE_MARKER_RE.match(lines[0].rstrip("\n")) for lines in (lines1, lines2))
+
+
+def _sections(lines, paged: bool) -> dict[int | None, list[str]]:
+    if paged:
+        return dict(split_pages(lines))
+    # Plain pages, or a PDF sidecar from before page markers: drop markers, diff lines.
+    return {None: [line for line in lines if not PAGE_MARKER_RE.match(line.rstrip("\n"))]}
+
+
+def diff_hunks(lines1: list[str], lines2: list[str]) -> list[Hunk]:
+    paged = _is_paged(lines1, lines2)
+    if not paged:
+        return _line_hunks(_sections(lines1, False)[None], _sections(lines2, False)[None])
+
+    # Align whole pages first, so an inserted page does not make every later page a change.
+    pages1, pages2 = split_pages(lines1), split_pages(lines2)
+    texts1 = ["".join(lines) for _, lines in pages1]
+    texts2 = ["".join(lines) for _, lines in pages2]
+    hunks = []
+    matcher = SequenceMatcher(None, texts1, texts2, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        old, new = pages1[i1:i2], pages2[j1:j2]
+        for k in range(max(len(old), len(new))):
+            page1, section1 = old[k] if k < len(old) else (None, [])
+            page2, section2 = new[k] if k < len(new) else (None, [])
+            hunks.extend(_line_hunks(section1, section2, page1, page2))
+    return hunks
+
+
+def _render_hunks(out, filename, hunks, sections1, sections2, label1, label2):
+    for tag, page1, page2, i1, i2, j1, j2 in hunks:
+        where1 = f"page {page1}, " if page1 else ""
+        where2 = f"page {page2}, " if page2 else ""
+        header = f" [page {page2 or page1}]" if page1 or page2 else ""
+        lines1, lines2 = sections1.get(page1, []), sections2.get(page2, [])
 
-            try:
-                with file1_path.open("r", encoding="utf-8") as f1, file2_path.open("r", encoding="utf-8") as f2:
-                    lines1 = f1.readlines()
-                    lines2 = f2.readlines()
+        out.write(f"\n--- Change ({tag.upper()}): {filename}{header}\n")
 
-                matcher = SequenceMatcher(None, lines1, lines2)
-                for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-                    if tag == 'equal':
-                        continue
+        if tag in ("replace", "delete"):
+            out.write(f"<<<< {label1} [{where1}lines {i1 + 1}-{i2}]\n")
+            out.writelines(line if line.strip() else "[BLANK LINE]\n" for line in lines1[i1:i2])
 
-                    out.write(f"\n--- Change ({tag.upper()}): {filename}\n")
+        if tag in ("replace", "insert"):
+            out.write(f">>>> {label2} [{where2}lines {j1 + 1}-{j2}]\n")
+            out.writelines(line if line.strip() else "[BLANK LINE]\n" for line in lines2[j1:j2])
 
-                    if tag in ('replace', 'delete'):
-                        out.write(f"<<<< {name1}/{filename} [lines {i1 + 1}-{i2}]\n")
-                        out.writelines(line if line.strip() else "[BLANK LINE]\n" for line in lines1[i1:i2])
+        out.write("\n")
 
-                    if tag in ('replace', 'insert'):
-                        out.write(f">>>> {name2}/{filename} [lines {j1 + 1}-{j2}]\n")
-                        out.writelines(line if line.strip() else "[BLANK LINE]\n" for line in lines2[j1:j2])
 
-                    out.write("\n")
+def _read_lines(path: Path) -> tuple[list[str], str]:
+    data = path.read_bytes()
+    # newline=None: the same universal-newline lines as reading the file in text mode.
+    return StringIO(data.decode("utf-8"), newline=None).readlines(), sha256(data).hexdigest()
 
-            except FileNotFoundError as e:
-                out.write(f"Error: {e}\n")
-            except Exception as e:
-                out.write(f"Unexpected error comparing {filename}: {e}\n")
+
+def diff_file(
+    filename: str, dir1_path: Path, dir2_path: Path, cache: DiffCache | None = None
+) -> str:
+    name1 = snapshot_label(dir1_path)
+    name2 = snapshot_label(dir2_path)
+    label1, label2 = f"{name1}/{filename}", f"{name2}/{filename}"
+    out = StringIO()
+
+    try:
+        lines1, hash1 = _read_lines(dir1_path / filename)
+        lines2, hash2 = _read_lines(dir2_path / filename)
+
+        if cache is None:
+            hunks = diff_hunks(lines1, lines2)
+        else:
+            hunks = cache.hunks(hash1, hash2, lambda: diff_hunks(lines1, lines2))
+        paged = _is_paged(lines1, lines2)
+        _render_hunks(
+            out,
+            filename,
+            hunks,
+            _sections(lines1, paged),
+            _sections(lines2, paged),
+            label1,
+            label2,
+        )
+
+    except FileNotFoundError as e:
+        out.write(f"Error: {e}\n")
+    except Exception as e:
+        out.write(f"Unexpected error comparing {filename}: {e}\n")
+
+    return out.getvalue()
+
+
+def generate_diff_report(
+    changed_files,
+    added_files,
+    removed_files,
+    dir1,
+    dir2,
+    precomputed: dict[str, str] = None,
+    cache: DiffCache | None = None,
+):
+    dir1_path = Path(dir1).resolve()
+    dir2_path = Path(dir2).resolve()
+    cache = cache or default_cache()
+
+    output_file = diff_report_path(dir1_path, dir2_path)
+    exports_dir = output_file.parent
+    exports_dir.mkdir(parents=True, exist_ok=True)
+
+    with output_file.open("w", encoding="utf-8") as out:
+        for filename in changed_files:
+            block = precomputed.get(filename) if precomputed else None
+            if block is None:
+                block = diff_file(filename, dir1_path, dir2_path, cache)
+            out.write(block)
 
         # Summary of added and removed files
         out.write("\n-----------------------\nAdded files:\n")
-        out.writelines(f"{file}\n" for file in added_files) if added_files else out.write("(None)\n")
+        out.write("".join(f"{file}\n" for file in added_files) or "(None)\n")
 
         out.write("\n------------------------\nRemoved files:\n")
-        out.writelines(f"{file}\n" for file in removed_files) if removed_files else out.write("(None)\n")
+        out.write("".join(f"{file}\n" for file in removed_files) or "(None)\n")
 
     lgg.i(f"Differences written to: {output_file}")
+    if cache is not None:
+        cache.flush()
 
     for file in added_files:
         export_file(file, dir2_path, exports_dir)
 
     for file in changed_files:
-        export_file(file, dir2_path, exports_dir)
\ No newline at end of file
+        export_file(file, dir2_path, exports_dir)
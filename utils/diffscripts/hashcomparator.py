@@ -10,11 +10,17 @@ Functions:
 - hash_and_compare(directory1, directory2): Hashes files in both directories (in parallel) and returns lists of changed, added, and removed files.
 """
 
-import re, hashlib, argparse, logging
-from pathlib import Path
-from datetime import datetime
+import argparse
+import hashlib
+import logging
+import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from utils.configs.config import setup_logger
+from datetime import datetime
+from pathlib import Path
+
+from utils.configs.logs import setup_logger
+from utils.profiling import add_profile_args, profiled
+
 lgg = setup_logger(logging.INFO)
 
 
@@ -39,7 +45,12 @@ def hash_directory_multithreaded(path: str) -> dict[str, str]:
         lgg.w(f"Directory does not exist: {dir_path}")
         return {}
 
-    file_paths = [p for p in dir_path.rglob("*") if p.is_file()]
+    # Dot-files and dot-dirs (run report, profiles, markers) are bookkeeping, not page content.
+    file_paths = [
+        p
+        for p in dir_path.rglob("*")
+        if p.is_file() and not any(part.startswith(".") for part in p.relative_to(dir_path).parts)
+    ]
     hashes = {}
 
     with ThreadPoolExecutor() as executor:
@@ -69,7 +80,9 @@ def sort_dirs_if_timestamped(dir1: str, dir2: str) -> tuple[str, str]:
     return dir1, dir2
 
 
-def compare_hash_dicts(dict1: dict[str, str], dict2: dict[str, str]) -> tuple[list[str], list[str], list[str]]:
+def compare_hash_dicts(
+    dict1: dict[str, str], dict2: dict[str, str]
+) -> tuple[list[str], list[str], list[str]]:
     keys1 = set(dict1.keys())
     keys2 = set(dict2.keys())
 
@@ -126,6 +139,7 @@ if __name__ == "__main__":
     )
     parser.add_argument("olddir", nargs="?", help="Path to the old directory (positional)")
     parser.add_argument("newdir", nargs="?", help="Path to the new directory (positional)")
+    add_profile_args(parser)
 
     args = parser.parse_args()
 
@@ -133,10 +147,13 @@ if __name__ == "__main__":
     dir2 = Path(args.newdir).resolve() if args.newdir else None
 
     if not dir1 or not dir2:
-        parser.error("You must provide both directories as positional arguments, preferably as [oldDir] [newDir].")
+        parser.error(
+            "You must provide both directories as positional arguments, preferably as [oldDir] [newDir]."
+        )
 
     dir1_str, dir2_str = sort_dirs_if_timestamped(str(dir1), str(dir2))
     lgg.i(f"Comparing directories:\n  OLD: {dir1_str}\n  NEW: {dir2_str}")
 
-    differences, added_files, removed_files = hash_and_compare(dir1_str, dir2_str)
-    print((differences, added_files, removed_files))
\ No newline at end of file
+    with profiled(args.profile, args.profile_dir or dir2_str, "hashcomparator"):
+        differences, added_files, removed_files = hash_and_compare(dir1_str, dir2_str)
+    print((differences, added_files, removed_files))
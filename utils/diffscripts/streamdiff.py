@@ -0,0 +1,84 @@
+"""
+PATH: ./wix-scraper/utils/diffscripts/
+
+Diffs pages against the previous snapshot while the crawl is still running.
+
+The scraper puts a PageEvent on a queue for every file it saves (see utils.scrape.main). The
+StreamingDiffer consumes that queue, diffs each changed page as soon as it lands, and keeps the
+resulting blocks so that finalize() only has to hash the new snapshot and write the report.
+
+Functions:
+- StreamingDiffer(old_dir, new_dir, old_hashes): Holds the per-file diff blocks for one comparison.
+- StreamingDiffer.consume(events): Diffs each PageEvent against the old snapshot until None arrives.
+- StreamingDiffer.finalize(): Re-hashes the new snapshot and writes the report, reusing blocks.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+
+from utils.configs.logs import setup_logger
+from utils.diffscripts.diffcache import default_cache
+from utils.diffscripts.diffgen import diff_file, generate_diff_report
+from utils.diffscripts.hashcomparator import compare_hash_dicts, hash_directory_multithreaded
+from utils.snapshots import PageEvent
+
+lgg = setup_logger(logging.INFO)
+
+
+class StreamingDiffer:
+    def __init__(self, old_dir: Path, new_dir: Path, old_hashes: dict[str, str] | None = None):
+        self.old_dir = Path(old_dir).resolve()
+        self.new_dir = Path(new_dir).resolve()
+        self.old_hashes = old_hashes
+        self.blocks: dict[str, str] = {}  # filename -> diff block
+        self.streamed: dict[str, str] = {}  # filename -> hash the block was computed for
+
+    async def consume(self, events: asyncio.Queue):
+        if self.old_hashes is None:
+            self.old_hashes = await asyncio.to_thread(
+                hash_directory_multithreaded, str(self.old_dir)
+            )
+
+        while True:
+            event: PageEvent | None = await events.get()
+            if event is None:
+                break
+
+            name = event.path.name
+            old_hash = self.old_hashes.get(name)
+            if old_hash is None or old_hash == event.sha256 or name.lower().endswith(".pdf"):
+                self.blocks.pop(name, None)
+                continue
+
+            # Events point into the staging dir (utils.snapshots.SnapshotWriter). If the crawl
+            # committed it meanwhile the block may be an error, so leave the file to finalize().
+            block = await asyncio.to_thread(
+                diff_file, name, self.old_dir, event.path.parent, default_cache()
+            )
+            if not event.path.exists():
+                continue
+            self.blocks[name] = block
+            self.streamed[name] = event.sha256
+
+        lgg.i(f"Streaming diff: {len(self.blocks)} changed files diffed during the crawl.")
+
+    def finalize(self) -> None:
+        if self.old_hashes is None:
+            self.old_hashes = hash_directory_multithreaded(str(self.old_dir))
+
+        # The final hash pass is authoritative; streamed blocks are only reused if still current.
+        new_hashes = hash_directory_multithreaded(str(self.new_dir))
+        changed, added, removed = compare_hash_dicts(self.old_hashes, new_hashes)
+        changed = [f for f in changed if not f.lower().endswith(".pdf")]
+
+        precomputed = {
+            name: block
+            for name, block in self.blocks.items()
+            if self.streamed.get(name) == new_hashes.get(name)
+        }
+        lgg.i(f"Streaming diff: reusing {len(precomputed)}/{len(changed)} precomputed blocks.")
+
+        generate_diff_report(
+            changed, added, removed, str(self.old_dir), str(self.new_dir), precomputed=precomputed
+        )
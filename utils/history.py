@@ -0,0 +1,358 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Full-text history of every snapshot in a local SQLite FTS5 index (results/.cache/history.sqlite).
+
+index_snapshots() only ingests snapshots it has not seen yet, and stores each distinct page text
+once (keyed by its sha256), so re-running it after a crawl takes seconds. Every (snapshot, page)
+pair points at its content row; URLs come from the snapshot's run report when there is one.
+
+Usage:
+    python -m utils.history index
+    python -m utils.history search '"border closure"' [--site korame]
+    python -m utils.history history https://www.example.com/news [--diff]
+    python -m utils.history changes --since 2025-07-01 [--until 2025-07-31]
+
+Functions:
+- HistoryIndex(path): Connection plus schema; the query methods below.
+- HistoryIndex.index_snapshots(results_root): Ingests new snapshots, returns how many.
+- HistoryIndex.search(query, site, limit): FTS5 match with first/last snapshot each text was seen.
+- HistoryIndex.history(page, site): Every snapshot of one page (by URL or filename).
+- HistoryIndex.changes(since, until, site): Pages changed/added/removed between snapshots in range.
+- pending_snapshots(results_root, index): Snapshot dirs not in the index yet.
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from utils.configs.logs import setup_logger
+from utils.profiling import add_profile_args, profiled
+from utils.snapshots import (
+    RESULTS_ROOT,
+    RUN_REPORT,
+    SNAPSHOT_FORMAT,
+    list_snapshots,
+    snapshot_time,
+)
+
+lgg = setup_logger(logging.INFO)
+
+INDEX_FILE = ".cache/history.sqlite"  # under the results root, next to the revisit hash cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE,  -- <ts> or <ts>/<site>
+    site TEXT NOT NULL,
+    taken TEXT NOT NULL,  -- ISO timestamp from the dir name
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    bytes INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS contents_fts USING fts5(body, tokenize = 'unicode61');
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    file TEXT NOT NULL,
+    url TEXT,
+    UNIQUE (site, file)
+);
+CREATE INDEX IF NOT EXISTS pages_url ON pages (url);
+CREATE TABLE IF NOT EXISTS versions (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    page_id INTEGER NOT NULL REFERENCES pages (id),
+    content_id INTEGER NOT NULL REFERENCES contents (id),
+    PRIMARY KEY (snapshot_id, page_id)
+);
+CREATE INDEX IF NOT EXISTS versions_content ON versions (content_id);
+CREATE INDEX IF NOT EXISTS versions_page ON versions (page_id);
+"""
+
+
+def _site_dirs(snapshot: Path) -> list[tuple[str, Path]]:
+    # Single-site snapshots keep pages at the top; multi-site ones have one subdir per site.
+    if (snapshot / RUN_REPORT).is_file() or any(snapshot.glob("*.txt")):
+        return [("", snapshot)]
+    return [
+        (p.name, p)
+        for p in sorted(snapshot.iterdir())
+        if p.is_dir() and p.name != "pdf" and not p.name.startswith(".")
+    ]
+
+
+def _label(snapshot: Path, site: str) -> str:
+    return f"{snapshot.name}/{site}" if site else snapshot.name
+
+
+def _parse_when(value: str, end_of_day: bool = False) -> str:
+    """A bare date is its first moment, or with end_of_day (for --until) its last."""
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d")
+        return (datetime.combine(day, datetime.max.time()) if end_of_day else day).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, SNAPSHOT_FORMAT).isoformat()
+    except ValueError:
+        pass
+    return datetime.fromisoformat(value).isoformat()
+
+
+def pending_snapshots(results_root: Path, index: "HistoryIndex") -> list[tuple[Path, str]]:
+    known = {row[0] for row in index.conn.execute("SELECT label FROM snapshots")}
+    return [
+        (snapshot, site)
+        for snapshot in list_snapshots(results_root)
+        for site, _ in _site_dirs(snapshot)
+        if _label(snapshot, site) not in known
+    ]
+
+
+class HistoryIndex:
+    def __init__(self, path: Path = RESULTS_ROOT / INDEX_FILE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    # -- ingest ------------------------------------------------------------------
+
+    def index_snapshots(self, results_root: Path = RESULTS_ROOT) -> int:
+        started = time.perf_counter()
+        pending = pending_snapshots(results_root, self)
+        for snapshot, site in pending:
+            self._index_one(snapshot, site)
+        if pending:
+            lgg.i(
+                f"Indexed {len(pending)} snapshot(s) in {time.perf_counter() - started:.1f}s "
+                f"({self.conn.execute('SELECT COUNT(*) FROM contents').fetchone()[0]} distinct texts)"
+            )
+        return len(pending)
+
+    def _index_one(self, snapshot: Path, site: str):
+        site_dir = snapshot / site
+        urls = {}
+        report = site_dir / RUN_REPORT
+        if report.is_file():
+            pages = json.loads(report.read_text(encoding="utf-8")).get("pages", {})
+            urls = {fields["file"]: url for url, fields in pages.items() if "file" in fields}
+
+        new_texts = 0
+        with self.conn:  # one transaction per snapshot; a crash leaves it un-indexed
+            snapshot_id = self.conn.execute(
+                "INSERT INTO snapshots (label, site, taken, indexed_at) VALUES (?, ?, ?, ?)",
+                (
+                    _label(snapshot, site),
+                    site,
+                    snapshot_time(snapshot).isoformat(),
+                    time.time(),
+                ),
+            ).lastrowid
+            for path in sorted(site_dir.glob("*.txt")):
+                data = path.read_bytes()
+                digest = hashlib.sha256(data).hexdigest()
+                row = self.conn.execute(
+                    "SELECT id FROM contents WHERE sha256 = ?", (digest,)
+                ).fetchone()
+                if row:
+                    content_id = row[0]
+                else:
+                    content_id = self.conn.execute(
+                        "INSERT INTO contents (sha256, bytes) VALUES (?, ?)", (digest, len(data))
+                    ).lastrowid
+                    self.conn.execute(
+                        "INSERT INTO contents_fts (rowid, body) VALUES (?, ?)",
+                        (content_id, data.decode("utf-8", errors="replace")),
+                    )
+                    new_texts += 1
+
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO pages (site, file, url) VALUES (?, ?, ?)",
+                    (site, path.name, urls.get(path.name)),
+                )
+                if path.name in urls:
+                    self.conn.execute(
+                        "UPDATE pages SET url = ? WHERE site = ? AND file = ? AND url IS NULL",
+                        (urls[path.name], site, path.name),
+                    )
+                page_id = self.conn.execute(
+                    "SELECT id FROM pages WHERE site = ? AND file = ?", (site, path.name)
+                ).fetchone()[0]
+                self.conn.execute(
+                    "INSERT INTO versions VALUES (?, ?, ?)", (snapshot_id, page_id, content_id)
+                )
+        lgg.i(f"Indexed {_label(snapshot, site)}: {new_texts} new texts")
+
+    # -- queries -----------------------------------------------------------------
+
+    def search(self, query: str, site: str | None = None, limit: int = 20) -> list[dict]:
+        rows = self.conn.execute(
+            """
+            WITH hits AS MATERIALIZED (
+                SELECT rowid, snippet(contents_fts, 0, '[', ']', ' ... ', 12) AS snippet
+                FROM contents_fts WHERE contents_fts MATCH ?
+            )
+            SELECT pages.site, pages.file, pages.url, MIN(snapshots.taken), MAX(snapshots.taken),
+                   MAX(hits.snippet)
+            FROM hits
+            JOIN versions ON versions.content_id = hits.rowid
+            JOIN pages ON pages.id = versions.page_id
+            JOIN snapshots ON snapshots.id = versions.snapshot_id
+            WHERE ? IS NULL OR pages.site = ?
+            GROUP BY pages.id
+            ORDER BY MIN(snapshots.taken)
+            LIMIT ?
+            """,
+            (query, site, site, limit),
+        ).fetchall()
+        keys = ("site", "file", "url", "first_seen", "last_seen", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def history(self, page: str, site: str | None = None) -> list[dict]:
+        rows = self.conn.execute(
+            """
+            SELECT snapshots.taken, snapshots.label, contents.sha256, contents.bytes,
+                   contents.id
+            FROM versions
+            JOIN pages ON pages.id = versions.page_id
+            JOIN snapshots ON snapshots.id = versions.snapshot_id
+            JOIN contents ON contents.id = versions.content_id
+            WHERE (pages.url = ? OR pages.file = ? OR pages.file = ? || '.txt')
+              AND (? IS NULL OR pages.site = ?)
+            ORDER BY snapshots.taken
+            """,
+            (page, page, page, site, site),
+        ).fetchall()
+        versions, previous = [], None
+        for taken, label, digest, size, content_id in rows:
+            versions.append(
+                {
+                    "taken": taken,
+                    "snapshot": label,
+                    "sha256": digest,
+                    "bytes": size,
+                    "changed": previous is not None and digest != previous,
+                    "content_id": content_id,
+                }
+            )
+            previous = digest
+        return versions
+
+    def text(self, content_id: int) -> str:
+        row = self.conn.execute(
+            "SELECT body FROM contents_fts WHERE rowid = ?", (content_id,)
+        ).fetchone()
+        return row[0] if row else ""
+
+    def changes(self, since: str, until: str | None = None, site: str | None = None) -> list[dict]:
+        until = until or datetime.max.isoformat()
+        snapshots = self.conn.execute(
+            "SELECT id, site, taken, label FROM snapshots WHERE (? IS NULL OR site = ?) "
+            "ORDER BY site, taken",
+            (site, site),
+        ).fetchall()
+
+        out, previous = [], {}
+        for snapshot_id, snap_site, taken, label in snapshots:
+            current = dict(
+                self.conn.execute(
+                    "SELECT page_id, content_id FROM versions WHERE snapshot_id = ?",
+                    (snapshot_id,),
+                )
+            )
+            before = previous.get(snap_site)
+            previous[snap_site] = current
+            if before is None or not since <= taken <= until:
+                continue
+            for page_id in set(before) | set(current):
+                if before.get(page_id) == current.get(page_id):
+                    continue
+                kind = (
+                    "added"
+                    if page_id not in before
+                    else "removed"
+                    if page_id not in current
+                    else "changed"
+                )
+                file, url = self.conn.execute(
+                    "SELECT file, url FROM pages WHERE id = ?", (page_id,)
+                ).fetchone()
+                out.append({"snapshot": label, "kind": kind, "file": file, "url": url})
+        return sorted(out, key=lambda c: (c["snapshot"], c["kind"], c["file"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search and browse every snapshot's text.")
+    parser.add_argument("--db", type=Path, help=f"Index file (default: <root>/{INDEX_FILE})")
+    parser.add_argument("--root", type=Path, default=RESULTS_ROOT, help="Results directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("index", help="Ingest snapshots that are not indexed yet")
+
+    search = commands.add_parser("search", help="FTS5 query, e.g. '\"exact phrase\"' or a NEAR b")
+    search.add_argument("query")
+    search.add_argument("--site")
+    search.add_argument("--limit", type=int, default=20)
+
+    history = commands.add_parser("history", help="Every version of one page (URL or filename)")
+    history.add_argument("page")
+    history.add_argument("--site")
+    history.add_argument("--diff", action="store_true", help="Print each change as a diff")
+
+    changes = commands.add_parser("changes", help="Pages changed between two dates")
+    changes.add_argument("--since", required=True, help="YYYY-MM-DD, YYMMDD-HHMMSS or ISO")
+    changes.add_argument("--until", help="Same formats; a bare date includes that whole day")
+    changes.add_argument("--site")
+    for command in (ingest, search, history, changes):
+        add_profile_args(command)
+
+    args = parser.parse_args()
+    with profiled(args.profile, args.profile_dir or args.root, "history"):
+        index = HistoryIndex(args.db or args.root / INDEX_FILE)
+        if args.command != "index":
+            index.index_snapshots(args.root)  # queries always see the latest crawl
+
+        if args.command == "index":
+            index.index_snapshots(args.root)
+        elif args.command == "search":
+            for hit in index.search(args.query, args.site, args.limit):
+                print(f"{hit['first_seen']} .. {hit['last_seen']}  {hit['url'] or hit['file']}")
+                print(f"    {hit['snippet']}")
+        elif args.command == "history":
+            versions = index.history(args.page, args.site)
+            if not versions:
+                parser.exit(1, f"No page matching {args.page!r} in the index.\n")
+            previous = None
+            for version in versions:
+                marker = "changed" if version["changed"] else ""
+                print(
+                    f"{version['taken']}  {version['snapshot']:<24} {version['sha256'][:12]} "
+                    f"{version['bytes']:>8} B  {marker}"
+                )
+                if args.diff and version["changed"]:
+                    diff = difflib.unified_diff(
+                        index.text(previous["content_id"]).splitlines(),
+                        index.text(version["content_id"]).splitlines(),
+                        previous["snapshot"],
+                        version["snapshot"],
+                        lineterm="",
+                    )
+                    print("\n".join(f"    {line}" for line in diff))
+                previous = version
+        else:
+            since = _parse_when(args.since)
+            until = _parse_when(args.until, end_of_day=True) if args.until else None
+            for change in index.changes(since, until, args.site):
+                print(
+                    f"{change['snapshot']:<24} {change['kind']:<8} {change['url'] or change['file']}"
+                )
@@ -0,0 +1,251 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Run instrumentation for the crawler and PDF pipeline.
+
+Functions:
+- Histogram: Fixed-bucket latency histogram; exact count/sum/max, percentiles from a bounded
+  reservoir of samples.
+- RunMetrics: Thread-safe counters, gauges (with peaks), histograms and per-URL stage timings.
+- RunMetrics.timer(url, stage): Context manager recording how long one stage took for one URL.
+- RunMetrics.write_report(path): Dumps everything as a JSON run report.
+- RunMetrics.merge(report): Folds another process's to_dict(samples=True) in (sharded crawls).
+- RunMetrics.delta(): to_dict(samples=True) with only the pages touched since the last delta(),
+  so a periodic push costs the same at hour three as at minute one.
+- render_prometheus(registries): Renders one or more RunMetrics (told apart by their labels) in
+  Prometheus text exposition format.
+- serve_metrics(port, registries): Serves render_prometheus() on http://127.0.0.1:<port>/metrics.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+RESERVOIR = 1024  # samples kept per histogram for percentiles
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, reservoir: int = RESERVOIR):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.reservoir = reservoir
+        self.samples: list[float] = []  # uniform sample of everything observed (algorithm R)
+        self._rng = random.Random(0)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        if len(self.samples) < self.reservoir:
+            self.samples.append(value)
+        else:
+            slot = self._rng.randrange(self.count)
+            if slot < self.reservoir:
+                self.samples[slot] = value
+
+    def merge(self, hist: dict):
+        """Folds in another histogram's to_dict(samples=True)."""
+        for i, upper in enumerate(self.buckets):
+            self.counts[i] += hist["buckets"].get(str(upper), 0)
+        ours, theirs = self.count, hist["count"]
+        self.count += theirs
+        self.sum += hist["sum"]
+        self.max = max(self.max, hist["max"])
+        samples = hist.get("samples", [])
+        if len(self.samples) + len(samples) <= self.reservoir:
+            self.samples += samples
+            return
+        # Each side's reservoir stands for its count; keep them in that proportion.
+        keep = min(len(self.samples), round(self.reservoir * ours / self.count))
+        take = min(len(samples), self.reservoir - keep)
+        self.samples = self._rng.sample(self.samples, keep) + self._rng.sample(samples, take)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self, samples: bool = False) -> dict:
+        out = {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+        }
+        if samples:
+            out["samples"] = list(self.samples)
+        return out
+
+
+class RunMetrics:
+    def __init__(self, labels: dict[str, str] | None = None):
+        self.labels = labels or {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        # Counters only ever go up (Prometheus `counter`); levels that can fall are gauges.
+        self.counters: dict[str, float] = {
+            "pages_done": 0,
+            "pdfs_downloaded": 0,
+            "retries": 0,
+            "failures": 0,
+        }
+        self.gauges: dict[str, float] = {}
+        self.peaks: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.pages: dict[str, dict] = {}  # url -> {stage: seconds, ...}
+        self._touched: set[str] = set()  # pages changed since the last delta()
+
+    def __getitem__(self, name: str) -> float:
+        return self.counters.get(name, 0)
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+            self.peaks[name] = max(self.peaks.get(name, value), value)
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.histograms.setdefault(name, Histogram()).observe(value)
+
+    def record_page(self, url: str, **fields):
+        with self._lock:
+            self.pages.setdefault(url, {}).update(fields)
+            self._touched.add(url)
+
+    @contextmanager
+    def timer(self, url: str, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(f"{stage}_seconds", elapsed)
+            with self._lock:
+                page = self.pages.setdefault(url, {})
+                page[stage] = page.get(stage, 0.0) + elapsed
+                self._touched.add(url)
+
+    def summary_line(self) -> str:
+        return "queued=%d, done_pages=%d, done_pdfs=%d, retries=%d, failures=%d" % (
+            self.gauges.get("pages_queued", 0),
+            self["pages_done"],
+            self["pdfs_downloaded"],
+            self["retries"],
+            self["failures"],
+        )
+
+    def to_dict(self, samples: bool = False) -> dict:
+        with self._lock:
+            return self._to_dict(samples, self.pages)
+
+    def delta(self) -> dict:
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            return self._to_dict(True, touched)
+
+    def _to_dict(self, samples: bool, urls) -> dict:
+        elapsed = time.time() - self.started
+        return {
+            "labels": self.labels,
+            "started": self.started,
+            "elapsed_seconds": elapsed,
+            "pages_per_second": self.counters.get("pages_done", 0) / elapsed if elapsed else 0,
+            "counters": dict(self.counters),
+            "gauges": {k: {"last": v, "peak": self.peaks[k]} for k, v in self.gauges.items()},
+            "histograms": {k: h.to_dict(samples) for k, h in self.histograms.items()},
+            "pages": {url: dict(self.pages[url]) for url in urls},
+        }
+
+    def write_report(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    def merge(self, report: dict):
+        """Counters and last gauge values add up, peaks take the max, histograms pool."""
+        with self._lock:
+            self.started = min(self.started, report["started"])
+            for name, value in report["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, gauge in report["gauges"].items():
+                self.gauges[name] = self.gauges.get(name, 0) + gauge["last"]
+                self.peaks[name] = max(self.peaks.get(name, gauge["peak"]), gauge["peak"])
+            for name, hist in report["histograms"].items():
+                self.histograms.setdefault(name, Histogram()).merge(hist)
+            for url, fields in report["pages"].items():
+                self.pages.setdefault(url, {}).update(fields)
+
+    def prometheus_families(self, prefix: str) -> dict[str, tuple[str, list[str]]]:
+        """Returns {family name: (type, sample lines)} for render_prometheus to merge."""
+        labels = ",".join(f'{k}="{v}"' for k, v in self.labels.items())
+        base = f"{{{labels}}}" if labels else ""
+        families: dict[str, tuple[str, list[str]]] = {}
+        with self._lock:
+            for name, value in self.counters.items():
+                families[f"{prefix}_{name}"] = ("counter", [f"{prefix}_{name}{base} {value}"])
+            for name, value in self.gauges.items():
+                families[f"{prefix}_{name}"] = ("gauge", [f"{prefix}_{name}{base} {value}"])
+            for name, hist in self.histograms.items():
+                lines, cumulative = [], 0
+                for upper, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    le = "+Inf" if math.isinf(upper) else str(upper)
+                    bucket_labels = ",".join(filter(None, [labels, f'le="{le}"']))
+                    lines.append(f"{prefix}_{name}_bucket{{{bucket_labels}}} {cumulative}")
+                lines.append(f"{prefix}_{name}_sum{base} {hist.sum}")
+                lines.append(f"{prefix}_{name}_count{base} {hist.count}")
+                families[f"{prefix}_{name}"] = ("histogram", lines)
+        return families
+
+
+def render_prometheus(registries: list[RunMetrics], prefix: str = "wix_scraper") -> str:
+    merged: dict[str, tuple[str, list[str]]] = {}
+    for registry in registries:
+        for family, (kind, lines) in registry.prometheus_families(prefix).items():
+            merged.setdefault(family, (kind, []))[1].extend(lines)
+
+    out = []
+    for family, (kind, lines) in merged.items():
+        out.append(f"# TYPE {family} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+def serve_metrics(port: int, registries: list[RunMetrics]) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus(registries).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
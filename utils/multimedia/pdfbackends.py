@@ -0,0 +1,241 @@
+"""
+PATH: ./wix-scraper/utils/multimedia/
+
+Pluggable PDF text extraction, page by page.
+
+Every backend yields (page key, extract) pairs; the key is a sha256 of the page's content streams,
+the streams of every Form XObject it draws (nested ones too), and font names (subset fonts carry a
+per-subset prefix, so re-embedded glyphs change the key). A page whose key did not change is read
+from results/.cache/pdfpages/ instead of being extracted again. The sidecar text carries a PAGE_MARKER line before every page, which lets
+diffgen.diff_file line pages up before it diffs lines.
+
+Backends (PDF_BACKEND):
+- pdfminer (default): pdfminer with layout analysis off; lines are rebuilt from character
+  baselines.
+- pdfminer-layout: pdfminer's full layout analysis (the old extract_text output), per page.
+- pymupdf: PyMuPDF, if installed (`pip install pymupdf`).
+- auto: pymupdf when importable, else pdfminer.
+
+Backends split lines and words differently, so switching backends (auto included, when PyMuPDF
+gets installed) rewrites every sidecar once and the next diff reports every PDF as changed.
+
+Functions:
+- get_backend(name): Returns the backend for a PDF_BACKEND value.
+- PDFExtractor(backend, max_pages, cache_dir): extract(path or bytes) -> Extraction (pages,
+  cache hits).
+- join_pages(pages): Sidecar text with a PAGE_MARKER before every page.
+- split_pages(lines): Splits sidecar lines back into (page number, lines); unmarked text is one
+  page numbered None.
+"""
+
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import re
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.snapshots import RESULTS_ROOT
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE = ".cache/pdfpages"  # under the results root
+PAGE_MARKER = "=== [page {n}] ==="
+PAGE_MARKER_RE = re.compile(r"^=== \[page (\d+)\] ===$")
+WORD_MARGIN = 0.1  # pdfminer's LAParams.word_margin
+# Part of every page key: bump when a backend's text output changes, so cached pages re-extract.
+CACHE_VERSION = 2
+
+PageSource = Iterator[tuple[str, Callable[[], str]]]
+
+
+def _digest(chunks: list[bytes]) -> str:
+    h = hashlib.sha256(b"v%d:" % CACHE_VERSION)
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+class PdfminerBackend:
+    """Layout analysis (LAParams) is what makes pdfminer slow; `layout=False` skips it."""
+
+    def __init__(self, layout: bool = False):
+        self.layout = layout
+        self.name = "pdfminer-layout" if layout else "pdfminer"
+
+    def pages(self, source: Path | bytes, max_pages: int = 0) -> PageSource:
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        resources = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(resources, laparams=LAParams() if self.layout else None)
+        interpreter = PDFPageInterpreter(resources, device)
+
+        def extract(page) -> str:
+            interpreter.process_page(page)
+            layout = device.get_result()
+            return self._layout_text(layout) if self.layout else self._char_text(layout)
+
+        with io.BytesIO(source) if isinstance(source, bytes) else open(source, "rb") as fp:
+            for page in PDFPage.get_pages(fp, maxpages=max_pages):
+                yield self._page_key(page), lambda page=page: extract(page)
+
+    @staticmethod
+    def _page_key(page) -> str:
+        from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+        from pdfminer.psparser import LIT
+
+        streams = [s.get_data() for s in page.contents]
+        names, seen = [], set()
+
+        # Text drawn by Form XObjects (`/Fm0 Do`) lives in their own streams, maybe nested.
+        def walk(resources):
+            resources = resolve1(resources) or {}
+            fonts = resolve1(resources.get("Font")) or {}
+            names.extend(str(resolve1(f).get("BaseFont", "")) for f in fonts.values())
+            for ref in (resolve1(resources.get("XObject")) or {}).values():
+                objid = ref.objid if isinstance(ref, PDFObjRef) else id(ref)
+                xobj = resolve1(ref)
+                if objid in seen or not isinstance(xobj, PDFStream):
+                    continue
+                if xobj.get("Subtype") is not LIT("Form"):
+                    continue  # images carry no text
+                seen.add(objid)
+                streams.append(xobj.get_data())
+                walk(xobj.get("Resources"))
+
+        walk(page.resources)
+        return _digest(streams + [repr(sorted(names)).encode()])
+
+    @staticmethod
+    def _layout_text(layout) -> str:
+        from pdfminer.layout import LTTextContainer
+
+        return "".join(item.get_text() for item in layout if isinstance(item, LTTextContainer))
+
+    @staticmethod
+    def _char_text(layout) -> str:
+        from pdfminer.layout import LTChar, LTContainer
+
+        def chars(item):
+            for child in item:
+                if isinstance(child, LTChar):
+                    yield child
+                elif isinstance(child, LTContainer):
+                    yield from chars(child)
+
+        # Characters arrive in content-stream order; a baseline jump of half a glyph starts a line.
+        # Most PDFs space words with TJ offsets rather than space glyphs, so a gap wider than
+        # WORD_MARGIN of the glyph size is a space, as in layout mode.
+        lines, current, baseline, x1 = [], [], None, None
+        for char in chars(layout):
+            if baseline is not None and abs(char.y0 - baseline) > char.height / 2:
+                lines.append("".join(current).rstrip())
+                current = []
+            elif x1 is not None and char.x0 - x1 > WORD_MARGIN * max(char.width, char.height):
+                if current and not current[-1].isspace() and not char.get_text().isspace():
+                    current.append(" ")
+            current.append(char.get_text())
+            baseline, x1 = char.y0, char.x1
+        if current:
+            lines.append("".join(current).rstrip())
+        return "\n".join(lines)
+
+
+class PymupdfBackend:
+    name = "pymupdf"
+
+    def pages(self, source: Path | bytes, max_pages: int = 0) -> PageSource:
+        import pymupdf
+
+        with (
+            pymupdf.open(stream=source)
+            if isinstance(source, bytes)
+            else pymupdf.open(source) as doc
+        ):
+            for number, page in enumerate(doc):
+                if max_pages and number >= max_pages:
+                    break
+                # (xref, ext, type, basefont, ...); fonts of Form XObjects included
+                fonts = sorted(font[3] for font in page.get_fonts())
+                # Every Form XObject the page draws, nested ones too: (xref, name, invoker, bbox)
+                forms = [doc.xref_stream(xobj[0]) or b"" for xobj in page.get_xobjects()]
+                key = _digest([page.read_contents(), *forms, repr(fonts).encode()])
+                yield key, page.get_text
+
+
+def get_backend(name: str = "pdfminer") -> PdfminerBackend | PymupdfBackend:
+    if name == "auto":
+        name = "pymupdf" if importlib.util.find_spec("pymupdf") else "pdfminer"
+    if name == "pymupdf":
+        return PymupdfBackend()
+    if name in ("pdfminer", "pdfminer-layout"):
+        return PdfminerBackend(layout=name == "pdfminer-layout")
+    raise ValueError(f"Unknown PDF backend {name!r} (auto, pdfminer, pdfminer-layout, pymupdf)")
+
+
+def join_pages(pages: list[str]) -> str:
+    return "".join(
+        f"{PAGE_MARKER.format(n=n)}\n{text.rstrip()}\n" for n, text in enumerate(pages, 1)
+    )
+
+
+def split_pages(lines: list[str]) -> list[tuple[int | None, list[str]]]:
+    pages: list[tuple[int | None, list[str]]] = []
+    for line in lines:
+        match = PAGE_MARKER_RE.match(line.rstrip("\n"))
+        if match:
+            pages.append((int(match.group(1)), []))
+        elif pages:
+            pages[-1][1].append(line)
+        else:
+            pages.append((None, [line]))  # sidecars written before page markers existed
+    return pages
+
+
+@dataclass
+class Extraction:
+    pages: list[str]
+    cached: int  # pages served from the page cache
+
+    @property
+    def text(self) -> str:
+        return join_pages(self.pages)
+
+
+class PDFExtractor:
+    def __init__(
+        self,
+        backend: str = "pdfminer",
+        max_pages: int = 0,
+        cache_dir: Path | None = RESULTS_ROOT / PAGE_CACHE,
+    ):
+        self.backend = get_backend(backend)
+        self.max_pages = max_pages  # 0 = every page
+        # Backends split lines differently, so each keeps its own cache.
+        self.cache_dir = cache_dir / self.backend.name if cache_dir else None
+
+    def extract(self, source: Path | bytes) -> Extraction:
+        """`source` is a PDF file or its bytes (PDFHandler extracts before the file is written)."""
+        pages, cached = [], 0
+        for key, extract in self.backend.pages(source, self.max_pages):
+            cache = self.cache_dir / key[:2] / f"{key}.txt" if self.cache_dir else None
+            if cache is not None and cache.is_file():
+                pages.append(cache.read_text(encoding="utf-8"))
+                cached += 1
+                continue
+            text = extract()
+            pages.append(text)
+            if cache is not None:
+                cache.parent.mkdir(parents=True, exist_ok=True)
+                partial = cache.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+                partial.write_text(text, encoding="utf-8")
+                partial.replace(cache)  # workers may extract the same page concurrently
+        logger.debug("%d pages, %d from cache (%s)", len(pages), cached, self.backend.name)
+        return Extraction(pages, cached)
@@ -3,23 +3,31 @@ import logging
 from pathlib import Path
 from urllib.parse import urlparse
 
-import aiofiles
-from pdfminer.high_level import extract_text as extract_pdf_text
 from playwright.async_api import APIResponse, Response
 
+from utils.metrics import RunMetrics
+from utils.multimedia.pdfbackends import PDFExtractor
+from utils.snapshots import SnapshotWriter
+
 logger = logging.getLogger(__name__)
 
 
 class PDFHandler:
-    def __init__(self, output_dir: Path, queue: asyncio.Queue, context, metrics_store: dict = None):
-        self.out_dir = output_dir  # This should be the /results/[timestamp]/pdf directory
+    def __init__(
+        self,
+        output_dir: Path,
+        queue: asyncio.Queue,
+        context,
+        writer: SnapshotWriter,
+        metrics_store: RunMetrics = None,
+        extractor: PDFExtractor = None,
+    ):
+        self.out_dir = output_dir  # results/<timestamp>.partial/[<site>/]pdf, the staging dir
         self.queue = queue
         self.context = context
-        self.metrics = metrics_store or {
-            "pdfs_downloaded": 0,
-            "failures": 0,
-            "retries": 0,
-        }
+        self.writer = writer  # shared write-behind queue; it also emits the PageEvents
+        self.metrics = metrics_store or RunMetrics()
+        self.extractor = extractor or PDFExtractor()
         self.out_dir.mkdir(parents=True, exist_ok=True)
 
     async def run_workers(self, count: int = 2):
@@ -28,28 +36,30 @@ class PDFHandler:
     async def worker(self):
         while True:
             url = await self.queue.get()
+            self.metrics.set_gauge("pdf_queue_depth", self.queue.qsize())
             if url is None:
                 break  # poison pill
             try:
                 await self.download_and_process_pdf(url)
             except Exception as e:
-                self.metrics["failures"] += 1
+                self.metrics.incr("failures")
                 logger.warning("PDF handling failed for %s: %s", url, e)
             finally:
                 self.queue.task_done()
 
     async def download_and_process_pdf(self, url: str):
         try:
-            res = await self.context.request.get(url)
+            with self.metrics.timer(url, "pdf_fetch"):
+                res = await self.context.request.get(url)
             await self.handle_response(res)
         except Exception as e:
-            self.metrics["retries"] += 1
+            self.metrics.incr("retries")
             logger.warning("Initial fetch failed for %s: %s — Retrying...", url, e)
             try:
                 fresh_res = await self.context.request.get(url)
                 await self.handle_response(fresh_res, is_retry=True)
             except Exception as retry_err:
-                self.metrics["failures"] += 1
+                self.metrics.incr("failures")
                 logger.error("Retry also failed for %s: %s", url, retry_err)
 
     async def handle_response(self, res: Response | APIResponse, is_retry: bool = False):
@@ -60,34 +70,42 @@ class PDFHandler:
 
         try:
             data = await res.body()
+            self.metrics.incr("bytes_pdf", len(data))
             await self.save_pdf(res.url, res.status, data)
         except Exception as e:
             if is_retry:
-                self.metrics["failures"] += 1
+                self.metrics.incr("failures")
                 logger.warning("PDF save failed for %s: %s", res.url, e)
             else:
                 raise e
 
     async def save_pdf(self, url: str, status: int, data: bytes):
         name = urlparse(url).path.split("/")[-1] or "doc.pdf"
-        pdf_path = self.out_dir / name                      # goes in /pdf/
-        text_path = self.out_dir.parent / f"{name}.txt"     # goes in parent timestamp dir
-    
-        if pdf_path.exists():
+        pdf_path = self.out_dir / name  # goes in /pdf/
+        text_path = self.out_dir.parent / f"{name}.txt"  # goes in parent timestamp dir
+
+        if self.writer.exists(pdf_path):
             logger.info("Skipping existing PDF: %s", name)
             return
-    
+
         if status != 200:
             logger.warning("HTTP %d while fetching %s", status, url)
-            self.metrics["failures"] += 1
+            self.metrics.incr("failures")
             return
-    
-        async with aiofiles.open(pdf_path, "wb") as f:
-            await f.write(data)
-    
-        text = await asyncio.to_thread(extract_pdf_text, pdf_path)
-        async with aiofiles.open(text_path, "w", encoding="utf-8") as f:
-            await f.write(text)
-    
-        self.metrics["pdfs_downloaded"] += 1
-        logger.info("PDF saved: %s and text extracted to: %s", pdf_path, text_path)
\ No newline at end of file
+
+        with self.metrics.timer(url, "pdf_save"):
+            await self.writer.write(pdf_path, data, event=False)
+
+        with self.metrics.timer(url, "pdf_extract"):
+            extraction = await asyncio.to_thread(self.extractor.extract, data)
+        self.metrics.incr("pdf_pages", len(extraction.pages))
+        self.metrics.incr("pdf_pages_cached", extraction.cached)
+
+        with self.metrics.timer(url, "pdf_save"):
+            await self.writer.write(text_path, extraction.text.encode("utf-8"))
+        self.metrics.record_page(
+            url, file=text_path.name, bytes=len(data), pdf=name, pages=len(extraction.pages)
+        )
+
+        self.metrics.incr("pdfs_downloaded")
+        logger.info("PDF queued: %s and text extracted to: %s", pdf_path, text_path)
@@ -0,0 +1,477 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Non-interactive replacement for the README sequence (scrape -> compare -> summarize -> email).
+
+Each stage declares its dependencies, inputs and outputs. A stage is skipped when all of its
+outputs exist and are newer than its inputs; stages whose dependencies are satisfied run
+concurrently. When a crawl runs, pages are diffed against the previous snapshot as they land
+(see utils.diffscripts.streamdiff), so compare only has to finish the report.
+
+Multi-site runs (SITES / SITES_FILE) get one compare/summarize/email chain per site, named
+"compare:<site>" etc.; `--force compare` matches every site's compare stage. Summarize prepends
+its summary to the diff report compare wrote, so forcing summarize forces compare too (a second
+summary on top of the first would otherwise pile up). The index stage
+adds new snapshots to the full-text history (utils.history) alongside compare.
+
+Functions:
+- Stage: Declaration of a single pipeline step (callable, deps, inputs, outputs).
+- PipelineContext: Paths shared between stages (results root, old/new snapshot, exports dir).
+- is_fresh(stage, ctx): Returns True if every output of the stage is newer than every input.
+- build_stages(sites): Returns scrape, index and a compare/summarize/email chain per site.
+- run_pipeline(stages, ctx, force, stop_after): Runs the DAG, skipping fresh stages.
+- main(): CLI entry point.
+"""
+
+import argparse
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable
+
+from utils.configs.logs import setup_logger
+from utils.diffscripts.diffgen import diff_report_path, generate_diff_report
+from utils.diffscripts.hashcomparator import compare_hash_dicts, hash_directory_multithreaded
+from utils.diffscripts.streamdiff import StreamingDiffer
+from utils.profiling import add_profile_args, mark_stage, profiled
+from utils.snapshots import (
+    RESULTS_ROOT,
+    check_committed,
+    latest_snapshot,
+    snapshot_time,
+    staging_dir,
+)
+
+lgg = setup_logger(logging.INFO)
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that cannot run in the current context (e.g. no previous snapshot)."""
+
+
+@dataclass
+class PipelineContext:
+    results_root: Path = RESULTS_ROOT
+    old_dir: Path | None = None  # snapshot roots (results/<ts>); sites live in subdirs
+    new_dir: Path | None = None
+    sites: list[str] = field(default_factory=lambda: [""])
+    shards: int = 1  # >1 crawls through utils.shard (no streaming diff)
+    scrape_max_age: timedelta = timedelta(hours=20)
+    artifacts: dict[str, Any] = field(default_factory=dict)
+
+    def site_dirs(self, site: str = "") -> tuple[Path | None, Path | None]:
+        old = self.old_dir / site if self.old_dir else None
+        new = self.new_dir / site if self.new_dir else None
+        return old, new
+
+    def diff_file(self, site: str = "") -> Path | None:
+        old, new = self.site_dirs(site)
+        if not old or not new:
+            return None
+        return diff_report_path(old, new)
+
+    def exports_dir(self, site: str = "") -> Path | None:
+        diff_file = self.diff_file(site)
+        return diff_file.parent if diff_file else None
+
+    def stamp(self, stage: "Stage") -> Path | None:
+        exports_dir = self.exports_dir(stage.site)
+        if not exports_dir:
+            return None
+        return exports_dir / ".stages" / f"{stage.name.split(':')[0]}.done"
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[PipelineContext], Any]
+    deps: tuple[str, ...] = ()
+    inputs: Callable[[PipelineContext], list[Path]] = lambda ctx: []
+    outputs: Callable[[PipelineContext], list[Path]] = lambda ctx: []
+    fresh: Callable[[PipelineContext], bool] | None = None  # overrides the mtime check
+    stamped: bool = False  # touch ctx.stamp(stage) on success and treat it as an output
+    rewrites_deps: bool = False  # edits its deps' outputs in place; forcing it forces them
+    site: str = ""
+
+
+def _newest_mtime(paths: list[Path]) -> float:
+    newest = 0.0
+    for path in paths:
+        if path.is_dir():
+            newest = max([newest] + [p.stat().st_mtime for p in path.rglob("*") if p.is_file()])
+        elif path.exists():
+            newest = max(newest, path.stat().st_mtime)
+    return newest
+
+
+def _stage_outputs(stage: Stage, ctx: PipelineContext) -> list[Path | None]:
+    outputs = list(stage.outputs(ctx))
+    if stage.stamped:
+        outputs.append(ctx.stamp(stage))
+    return outputs
+
+
+def is_fresh(stage: Stage, ctx: PipelineContext) -> bool:
+    if stage.fresh is not None:
+        return stage.fresh(ctx)
+
+    outputs = _stage_outputs(stage, ctx)
+    if not outputs or any(p is None or not p.exists() for p in outputs):
+        return False
+
+    oldest_output = min(p.stat().st_mtime for p in outputs)
+    return oldest_output >= _newest_mtime(stage.inputs(ctx))
+
+
+# ---------------------------------------------------------------------------
+# Default stages
+# ---------------------------------------------------------------------------
+
+
+def _scrape_is_fresh(ctx: PipelineContext) -> bool:
+    latest = latest_snapshot(ctx.results_root)
+    return latest is not None and datetime.now() - snapshot_time(latest) < ctx.scrape_max_age
+
+
+async def _run_scrape(ctx: PipelineContext) -> None:
+    from utils import scrape
+
+    ctx.new_dir = scrape.OUT_DIR
+    if ctx.shards > 1:
+        from utils.configs.config import CrawlSettings, get_settings
+        from utils.shard import coordinate
+
+        sites = get_settings(CrawlSettings).site_configs()
+        await asyncio.to_thread(coordinate, ctx.shards, sites, scrape.OUT_DIR)
+        return
+    if ctx.old_dir is None:
+        await scrape.main()
+        return
+
+    # One differ per site; the router hands each PageEvent to the site whose dir holds it.
+    events = asyncio.Queue()
+    differs, queues = {}, {}
+    for site in ctx.sites:
+        old, new = ctx.site_dirs(site)
+        if old.is_dir():
+            differs[site] = StreamingDiffer(old, new)
+            queues[site] = asyncio.Queue()
+    ctx.artifacts["differs"] = differs
+
+    async def crawl():
+        try:
+            await scrape.main(events)
+        except Exception:
+            await events.put(None)  # unblock the differs before propagating
+            raise
+
+    async def route():
+        while (event := await events.get()) is not None:
+            for site, queue in queues.items():
+                if event.path.is_relative_to(staging_dir(ctx.new_dir) / site):
+                    await queue.put(event)
+                    break
+        for queue in queues.values():
+            await queue.put(None)
+
+    await asyncio.gather(
+        crawl(), route(), *(differ.consume(queues[site]) for site, differ in differs.items())
+    )
+
+
+def _index_is_fresh(ctx: PipelineContext) -> bool:
+    from utils.history import INDEX_FILE, HistoryIndex, pending_snapshots
+
+    return not pending_snapshots(ctx.results_root, HistoryIndex(ctx.results_root / INDEX_FILE))
+
+
+def _run_index(ctx: PipelineContext) -> None:
+    from utils.history import INDEX_FILE, HistoryIndex
+
+    HistoryIndex(ctx.results_root / INDEX_FILE).index_snapshots(ctx.results_root)
+
+
+def _require_site_dirs(ctx: PipelineContext, site: str) -> tuple[Path, Path]:
+    old, new = ctx.site_dirs(site)
+    if old is None or not old.is_dir():
+        raise StageSkipped("no previous snapshot to compare against")
+    return old, new
+
+
+def _run_compare(ctx: PipelineContext, site: str = "") -> None:
+    old_dir, new_dir = _require_site_dirs(ctx, site)
+    check_committed(new_dir)  # an unfinished crawl would show every page it missed as removed
+    check_committed(old_dir)
+    differ = ctx.artifacts.get("differs", {}).get(site)
+    if differ is not None:
+        differ.finalize()
+        return
+
+    old_hashes = hash_directory_multithreaded(str(old_dir))
+    new_hashes = hash_directory_multithreaded(str(new_dir))
+    changed, added, removed = compare_hash_dicts(old_hashes, new_hashes)
+
+    # Replaces the manual "remove PDFs" step: the .pdf.txt sidecar carries the text diff.
+    changed = [f for f in changed if not f.lower().endswith(".pdf")]
+    generate_diff_report(changed, added, removed, str(old_dir), str(new_dir))
+
+
+def _run_summarize(ctx: PipelineContext, site: str = "") -> None:
+    from utils.summarize import main as summarize
+
+    _require_site_dirs(ctx, site)
+    from_date = snapshot_time(ctx.old_dir).strftime(TIMESTAMP_FORMAT)
+    to_date = snapshot_time(ctx.new_dir).strftime(TIMESTAMP_FORMAT)
+    summarize(str(ctx.diff_file(site)), from_date, to_date)
+
+
+def _run_email(ctx: PipelineContext, site: str = "") -> None:
+    from utils.send_email import gmail_send_message
+
+    _require_site_dirs(ctx, site)
+    # gmail_send_message logs an HttpError and returns None; without a message no stamp.
+    if gmail_send_message(ctx.exports_dir(site)) is None:
+        raise RuntimeError(f"Gmail did not send the report in {ctx.exports_dir(site)}")
+
+
+def _site_stages(site: str) -> list[Stage]:
+    suffix = f":{site}" if site else ""
+
+    def diff_file(ctx):
+        return [ctx.diff_file(site)] if ctx.diff_file(site) else []
+
+    return [
+        Stage(
+            name=f"compare{suffix}",
+            run=partial(_run_compare, site=site),
+            deps=("scrape",),
+            inputs=lambda ctx: [p for p in ctx.site_dirs(site) if p],
+            outputs=diff_file,
+            site=site,
+        ),
+        Stage(
+            name=f"summarize{suffix}",
+            run=partial(_run_summarize, site=site),
+            deps=(f"compare{suffix}",),
+            inputs=diff_file,
+            stamped=True,
+            rewrites_deps=True,
+            site=site,
+        ),
+        Stage(
+            name=f"email{suffix}",
+            run=partial(_run_email, site=site),
+            deps=(f"summarize{suffix}",),
+            inputs=lambda ctx: [ctx.exports_dir(site)] if ctx.exports_dir(site) else [],
+            stamped=True,
+            site=site,
+        ),
+    ]
+
+
+def build_stages(sites: list[str] | None = None) -> list[Stage]:
+    stages = [
+        Stage(
+            name="scrape",
+            run=_run_scrape,
+            fresh=_scrape_is_fresh,
+        ),
+        Stage(
+            name="index",
+            run=_run_index,
+            deps=("scrape",),
+            fresh=_index_is_fresh,
+        ),
+    ]
+    for site in sites or [""]:
+        stages.extend(_site_stages(site))
+    return stages
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+def _resolve_snapshots(ctx: PipelineContext, scrape_fresh: bool) -> None:
+    """Pins old/new snapshot dirs before any stage runs so the crawl can stream diffs."""
+    latest = latest_snapshot(ctx.results_root)
+    if scrape_fresh:
+        ctx.new_dir = ctx.new_dir or latest
+        ctx.old_dir = ctx.old_dir or latest_snapshot(ctx.results_root, before=ctx.new_dir)
+    else:
+        ctx.old_dir = ctx.old_dir or latest
+
+
+def _downstream(stages: list[Stage], names: set[str]) -> set[str]:
+    result = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage.name not in result and result.intersection(stage.deps):
+                result.add(stage.name)
+                changed = True
+    return result
+
+
+def _upstream(stages: list[Stage], name: str) -> set[str]:
+    by_name = {s.name: s for s in stages}
+    result = set()
+    pending = [s.name for s in stages if name in (s.name, s.name.split(":")[0])]
+    while pending:
+        current = pending.pop()
+        if current in result:
+            continue
+        result.add(current)
+        pending.extend(by_name[current].deps)
+    return result
+
+
+async def run_pipeline(
+    stages: list[Stage],
+    ctx: PipelineContext,
+    force: set[str] | None = None,
+    stop_after: str | None = None,
+) -> dict[str, str]:
+    by_name = {s.name: s for s in stages}
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {missing}")
+
+    # Forcing a stage invalidates everything downstream of it.
+    force = set(force or ())
+    force |= {dep for s in stages if s.name in force and s.rewrites_deps for dep in s.deps}
+    force = _downstream(stages, force)
+    selected = _upstream(stages, stop_after) if stop_after else set(by_name)
+
+    scrape = by_name.get("scrape")
+    _resolve_snapshots(ctx, scrape is not None and "scrape" not in force and is_fresh(scrape, ctx))
+
+    status: dict[str, str] = {}
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def execute(stage: Stage) -> bool:
+        dep_results = await asyncio.gather(*(tasks[d] for d in stage.deps))
+        if not all(dep_results):
+            status[stage.name] = "blocked"
+            return False
+
+        dep_ran = any(status.get(d) == "ran" for d in stage.deps)
+        if stage.name not in force and not dep_ran and is_fresh(stage, ctx):
+            status[stage.name] = "fresh"
+            lgg.i(f"[{stage.name}] outputs are fresh - skipping")
+            return True
+
+        lgg.i(f"[{stage.name}] starting")
+        mark_stage(f"{stage.name}:start")
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(stage.run):
+                await stage.run(ctx)
+            else:
+                await asyncio.to_thread(stage.run, ctx)
+        except StageSkipped as e:
+            status[stage.name] = "skipped"
+            lgg.w(f"[{stage.name}] skipped: {e}")
+            return False
+        except Exception as e:
+            status[stage.name] = "failed"
+            lgg.er(f"[{stage.name}] failed: {e}", exc_info=True)
+            return False
+
+        if stage.stamped and ctx.stamp(stage):
+            stamp = ctx.stamp(stage)
+            stamp.parent.mkdir(parents=True, exist_ok=True)
+            stamp.write_text(datetime.now().isoformat())
+
+        status[stage.name] = "ran"
+        mark_stage(f"{stage.name}:done")
+        lgg.i(f"[{stage.name}] finished in {time.perf_counter() - started:.1f}s")
+        return True
+
+    # Stages are declared in dependency order, so every dep task exists before it is awaited.
+    for stage in stages:
+        if stage.name in selected:
+            tasks[stage.name] = asyncio.create_task(execute(stage))
+        else:
+            status[stage.name] = "not selected"
+
+    await asyncio.gather(*tasks.values())
+    return status
+
+
+def main():
+    from utils.configs.config import CrawlSettings, get_settings
+
+    try:
+        sites = [site.out_subdir for site in get_settings(CrawlSettings).site_configs()]
+    except ValueError:
+        sites = [
+            ""
+        ]  # nothing to crawl; fine for --old/--new, the scrape stage reports it otherwise
+    stages = build_stages(sites)
+    names = [s.name for s in stages]
+    # "compare" etc. select every site's stage in a multi-site run.
+    groups = sorted({name.split(":")[0] for name in names} - set(names))
+
+    parser = argparse.ArgumentParser(
+        description="Run the scrape -> compare -> summarize -> email pipeline."
+    )
+    parser.add_argument("--old", type=Path, help="Old snapshot (default: latest before new)")
+    parser.add_argument("--new", type=Path, help="New snapshot (default: fresh scrape or latest)")
+    parser.add_argument(
+        "--force",
+        action="append",
+        choices=names + groups + ["all"],
+        default=[],
+        help="Re-run a stage (and everything downstream) even if its outputs are fresh",
+    )
+    parser.add_argument(
+        "--stop-after", choices=names + groups, help="Stop once this stage has run"
+    )
+    parser.add_argument(
+        "--scrape-max-age",
+        type=float,
+        default=20.0,
+        help="Hours a previous snapshot counts as fresh enough to skip scraping (default: 20)",
+    )
+    parser.add_argument(
+        "--shards", type=int, default=1, help="Crawl with this many worker processes (utils.shard)"
+    )
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    ctx = PipelineContext(
+        old_dir=args.old.resolve() if args.old else None,
+        new_dir=args.new.resolve() if args.new else None,
+        sites=sites,
+        shards=args.shards,
+        scrape_max_age=timedelta(hours=args.scrape_max_age),
+    )
+    force = {n for n in names if "all" in args.force or {n, n.split(":")[0]} & set(args.force)}
+    if ctx.new_dir:
+        force.discard("scrape")
+        for stage in stages:
+            if stage.name == "scrape":
+                stage.fresh = lambda _ctx: True  # an explicit --new snapshot replaces the crawl
+
+    started = time.perf_counter()
+    with profiled(args.profile, args.profile_dir or ctx.results_root, "pipeline"):
+        status = asyncio.run(run_pipeline(stages, ctx, force=force, stop_after=args.stop_after))
+
+    lgg.i(f"Pipeline finished in {time.perf_counter() - started:.1f}s")
+    for name in names:
+        lgg.i(f"  {name:<20} {status.get(name, '-')}")
+
+
+if __name__ == "__main__":
+    main()
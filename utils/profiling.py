@@ -0,0 +1,210 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Opt-in CPU/memory profiling for the CLI entry points (`--profile cprofile|sample`).
+
+While a profile is active:
+- sample (the default for a bare --profile): a background thread samples every thread's stack
+  every few ms and writes flamegraph-ready collapsed stacks
+  (`flamegraph.pl profile.collapsed > flame.svg`).
+- cprofile: cProfile started on the main thread (and so the asyncio loop); written as .pstats
+  plus a cumulative-time text summary. Work in other threads (asyncio.to_thread PDF extraction
+  and snapshot writes, the hashing pool) is missing before Python 3.12 and mixed into the main
+  thread's call timings from 3.12 on, where cProfile allows only one active profiler per process.
+  Use it for the event loop; use sample to see where worker threads spend their time.
+- always: tracemalloc snapshots are taken at every mark_stage() boundary (top-N allocation sites
+  and growth since the previous stage), and asyncio debug mode is enabled so callbacks slower
+  than asyncio's slow_callback_duration (100 ms) are logged to slow_callbacks.log.
+
+Artifacts go into <out_dir>/.profile/<name>-<timestamp>/; the dot keeps them out of hash
+comparison.
+
+Functions:
+- add_profile_args(parser): Adds --profile / --profile-dir to an argparse parser.
+- profiled(mode, out_dir, name): Context manager running the body under the selected profiler.
+- mark_stage(name): Records a tracemalloc snapshot on the active profiler (no-op otherwise).
+"""
+
+import argparse
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_MODES = ("sample", "cprofile")
+SAMPLE_INTERVAL_SECONDS = 0.005
+MEMORY_TOP_N = 25
+
+_active: "Profiler | None" = None
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.records: list[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(
+            f"{datetime.fromtimestamp(record.created).isoformat()} {record.getMessage()}"
+        )
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                parts.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(parts))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    def __init__(self, mode: str, out_dir: Path):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}")
+        self.mode = mode
+        self.out_dir = out_dir
+        self._cprofile: cProfile.Profile | None = None
+        self._sampler: _StackSampler | None = None
+        self._slow = _ListHandler()
+        self._memory: list[tuple[str, float, tracemalloc.Snapshot]] = []
+        self._prev_asyncio_debug = os.environ.get("PYTHONASYNCIODEBUG")
+
+    def start(self):
+        tracemalloc.start(10)
+        self.mark("start")
+
+        # New event loops pick debug mode up from the environment (see asyncio.coroutines).
+        os.environ["PYTHONASYNCIODEBUG"] = "1"
+        logging.getLogger("asyncio").addHandler(self._slow)
+
+        if self.mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = _StackSampler(SAMPLE_INTERVAL_SECONDS)
+            self._sampler.start()
+
+    def mark(self, stage: str):
+        if tracemalloc.is_tracing():
+            self._memory.append((stage, time.perf_counter(), tracemalloc.take_snapshot()))
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+        if self._sampler:
+            self._sampler.stop()
+        self.mark("end")
+
+        logging.getLogger("asyncio").removeHandler(self._slow)
+        if self._prev_asyncio_debug is None:
+            os.environ.pop("PYTHONASYNCIODEBUG", None)
+        else:
+            os.environ["PYTHONASYNCIODEBUG"] = self._prev_asyncio_debug
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self._cprofile:
+            self._cprofile.dump_stats(self.out_dir / "profile.pstats")
+            summary = io.StringIO()
+            pstats.Stats(self._cprofile, stream=summary).sort_stats("cumulative").print_stats(60)
+            (self.out_dir / "profile_top.txt").write_text(summary.getvalue(), encoding="utf-8")
+        if self._sampler:
+            lines = (f"{stack} {count}" for stack, count in self._sampler.stacks.most_common())
+            (self.out_dir / "profile.collapsed").write_text(
+                "\n".join(lines) + "\n", encoding="utf-8"
+            )
+
+        self._write_memory_report()
+        (self.out_dir / "slow_callbacks.log").write_text(
+            "\n".join(self._slow.records) + "\n", encoding="utf-8"
+        )
+        tracemalloc.stop()
+
+    def _write_memory_report(self):
+        out = io.StringIO()
+        previous = None
+        started = self._memory[0][1] if self._memory else 0.0
+        for stage, at, snapshot in self._memory:
+            current, _ = _snapshot_size(snapshot)
+            out.write(f"=== {stage} (t={at - started:.2f}s, traced={current / 2**20:.1f} MiB)\n")
+            for stat in snapshot.statistics("lineno")[:MEMORY_TOP_N]:
+                out.write(f"  {stat}\n")
+            if previous is not None:
+                out.write("--- growth since previous stage\n")
+                for stat in snapshot.compare_to(previous, "lineno")[:MEMORY_TOP_N]:
+                    out.write(f"  {stat}\n")
+            out.write("\n")
+            previous = snapshot
+        (self.out_dir / "memory_top.txt").write_text(out.getvalue(), encoding="utf-8")
+
+
+def _snapshot_size(snapshot: tracemalloc.Snapshot) -> tuple[int, int]:
+    stats = snapshot.statistics("filename")
+    return sum(s.size for s in stats), sum(s.count for s in stats)
+
+
+def add_profile_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="sample",
+        choices=PROFILE_MODES,
+        help=(
+            "Profile this run plus tracemalloc and slow asyncio callbacks. sample (the default) "
+            "covers every thread; cprofile only times the main thread and its event loop"
+        ),
+    )
+    parser.add_argument(
+        "--profile-dir", type=Path, help="Where to write profile artifacts (default: run dir)"
+    )
+
+
+@contextmanager
+def profiled(mode: str | None, out_dir: Path, name: str):
+    global _active
+    if not mode:
+        yield None
+        return
+
+    target = Path(out_dir) / ".profile" / f"{name}-{datetime.now():%y%m%d-%H%M%S}"
+    profiler = Profiler(mode, target)
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _active = None
+        profiler.stop()
+        logging.getLogger(__name__).info("Profile artifacts written to %s", target)
+
+
+def mark_stage(name: str):
+    if _active is not None:
+        _active.mark(name)
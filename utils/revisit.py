@@ -0,0 +1,245 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Change-rate-aware revisit scheduling.
+
+Each page file is treated as a Poisson process. From the last REVISIT_HISTORY snapshots (hashed
+once with hash_directory_multithreaded, cached under results/.cache/hashes/) we count n
+intervals between consecutive real fetches of a file and the X of them in which its hash changed.
+The rate uses the bias-reduced estimator of Cho & Garcia-Molina:
+
+    rate = -ln((n - X + 0.5) / (n + 0.5)) / mean interval (changes per day)
+
+A page's priority is the probability it changed since it was last actually fetched,
+1 - exp(-rate * age), with rate floored at MIN_RATE_PER_DAY so stable pages come back around
+eventually. Unknown pages get 1.0, so new pages go first.
+
+PriorityFrontier hands URLs out in that order until the run's page/time budget is spent. Pages
+still pending then are deferred: carry_forward() copies their previous version into the new
+snapshot so compare does not report them as removed. It also lists them in .revisit.json, so
+they never count as "unchanged" observations in later estimates.
+
+Functions:
+- RevisitModel.learn(results_root, site, current, history): Fits per-file change rates.
+- RevisitModel.priority(url): Probability the URL's file changed since its last real fetch.
+- PriorityFrontier(seeds, blacklist, priority, max_pages, max_seconds): Budgeted
+  highest-priority-first drop-in for scrape.Frontier.
+- carry_forward(urls, previous_dir, out_dir): Copies deferred pages from the previous snapshot.
+- snapshot_files(url): Files a URL produces in a snapshot dir (page text, or PDF + sidecar).
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import math
+import shutil
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+from utils.configs.logs import setup_logger
+from utils.diffscripts.hashcomparator import hash_directory_multithreaded
+from utils.snapshots import RUN_REPORT, list_snapshots, snapshot_time
+from utils.urlcanon import url_to_filename
+
+lgg = setup_logger(logging.INFO)
+
+REVISIT_MARKER = ".revisit.json"  # dot-prefixed so hash comparison ignores it
+CACHE_DIR = ".cache/hashes"
+# Never-changed pages still get this rate, so their priority grows with age instead of staying 0.
+MIN_RATE_PER_DAY = 1 / 90
+
+
+def snapshot_files(url: str) -> list[str]:
+    if urlparse(url).path.lower().endswith(".pdf"):
+        name = urlparse(url).path.split("/")[-1] or "doc.pdf"  # as in PDFHandler.save_pdf
+        return [f"{name}.txt", f"pdf/{name}"]
+    return [f"{url_to_filename(url)}.txt"]
+
+
+def _cached_hashes(results_root: Path, snapshot: Path, site: str) -> dict[str, str]:
+    # Finished snapshots never change, so each one is hashed once.
+    cache = results_root / CACHE_DIR / f"{snapshot.name}{'__' + site if site else ''}.json"
+    if cache.is_file():
+        return json.loads(cache.read_text(encoding="utf-8"))
+    hashes = hash_directory_multithreaded(str(snapshot / site))
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    cache.write_text(json.dumps(hashes), encoding="utf-8")
+    return hashes
+
+
+def _read_json(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8")) if path.is_file() else {}
+
+
+@dataclass
+class PageStats:
+    intervals: int = 0
+    changes: int = 0
+    days: float = 0.0
+    last_fetched: datetime | None = None
+
+    @property
+    def rate(self) -> float | None:
+        if not self.intervals or not self.days:
+            return None
+        n, x = self.intervals, self.changes
+        return -math.log((n - x + 0.5) / (n + 0.5)) / (self.days / n)
+
+
+class RevisitModel:
+    def __init__(
+        self,
+        stats: dict[str, PageStats],
+        known_urls: list[str],
+        now: datetime | None = None,
+    ):
+        self.stats = stats
+        # Every URL the previous run fetched or deferred, to re-seed the frontier.
+        self.known_urls = known_urls
+        self.now = now or datetime.now()
+
+    @classmethod
+    def learn(
+        cls,
+        results_root: Path,
+        site: str = "",
+        current: Path | None = None,
+        history: int = 30,
+    ) -> "RevisitModel":
+        snapshots = [
+            s
+            for s in list_snapshots(results_root)
+            if (current is None or s.name != current.name) and (s / site).is_dir()
+        ][-history:]
+
+        stats: dict[str, PageStats] = {}
+        last_hash: dict[str, str] = {}
+        report, marker = {}, {}
+        for snapshot in snapshots:
+            hashes = _cached_hashes(results_root, snapshot, site)
+            taken = snapshot_time(snapshot)
+            report = _read_json(snapshot / site / RUN_REPORT)
+            marker = _read_json(snapshot / site / REVISIT_MARKER)
+            # Carried-forward copies were not fetched; an interval runs between real fetches.
+            for name in set(hashes) - set(marker.get("carried", [])):
+                page = stats.setdefault(name, PageStats())
+                if page.last_fetched is not None:
+                    page.intervals += 1
+                    page.days += (taken - page.last_fetched).total_seconds() / 86400
+                    page.changes += hashes[name] != last_hash[name]
+                page.last_fetched = taken
+                last_hash[name] = hashes[name]
+
+        # Deferred pages were not fetched, so only the marker remembers them.
+        known_urls = list(report.get("pages", {})) + marker.get("deferred", [])
+
+        lgg.i(
+            f"Revisit model{' for ' + site if site else ''}: {len(snapshots)} snapshots, "
+            f"{sum(1 for s in stats.values() if s.rate is not None)} pages with a change rate"
+        )
+        return cls(stats, known_urls)
+
+    def change_probability(self, name: str) -> float:
+        page = self.stats.get(name)
+        if page is None or page.rate is None or page.last_fetched is None:
+            return 1.0
+        age_days = max((self.now - page.last_fetched).total_seconds() / 86400, 0.0)
+        return 1.0 - math.exp(-max(page.rate, MIN_RATE_PER_DAY) * age_days)
+
+    def priority(self, url: str) -> float:
+        # Hash keys are basenames ("pdf/x.pdf" is hashed as "x.pdf").
+        return max(self.change_probability(Path(name).name) for name in snapshot_files(url))
+
+
+class PriorityFrontier:
+    """Same interface as utils.scrape.Frontier; pops the highest priority first."""
+
+    def __init__(
+        self,
+        seeds: list[str],
+        blacklist: list[str],
+        priority: Callable[[str], float],
+        max_pages: int = 0,
+        max_seconds: float = 0,
+    ):
+        self.pending: set[str] = set()
+        self.visited: set[str] = set()
+        self.blacklist = set(blacklist)
+        self.in_flight = 0
+        self.priority = priority
+        self.max_pages = max_pages
+        self.deadline = time.monotonic() + max_seconds if max_seconds else None
+        self.popped = 0
+        self._heap: list[tuple[float, int, str]] = []
+        self._order = itertools.count()
+        for url in seeds:
+            self.add(url)
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    @property
+    def budget_spent(self) -> bool:
+        if self.max_pages and self.popped >= self.max_pages:
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def exhausted(self) -> bool:
+        return self.in_flight == 0 and (not self.pending or self.budget_spent)
+
+    @property
+    def deferred(self) -> set[str]:
+        return set(self.pending)
+
+    def add(self, url: str):
+        if not url or url in self.visited or url in self.pending:
+            return
+        self.pending.add(url)
+        heapq.heappush(self._heap, (-self.priority(url), next(self._order), url))
+
+    def pop(self) -> str | None:
+        if self.budget_spent:
+            return None
+        while self._heap:
+            _, _, url = heapq.heappop(self._heap)
+            if url not in self.pending:
+                continue
+            self.pending.discard(url)
+            if url in self.visited or url in self.blacklist:
+                continue
+            self.visited.add(url)
+            self.in_flight += 1
+            self.popped += 1
+            return url
+        return None
+
+    def done(self, url: str):
+        self.in_flight -= 1
+
+    def requeue(self, url: str):
+        self.visited.discard(url)
+        self.popped -= 1  # access-denied retries do not use up the budget
+        self.add(url)
+
+
+def carry_forward(urls: set[str], previous_dir: Path | None, out_dir: Path) -> list[str]:
+    carried = []
+    if previous_dir is not None and previous_dir.is_dir():
+        for url in sorted(urls):
+            for name in snapshot_files(url):
+                src, dst = previous_dir / name, out_dir / name
+                if src.is_file() and not dst.exists():
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(src, dst)
+                    carried.append(Path(name).name)  # hash keys are basenames
+
+    marker = {"deferred": sorted(urls), "carried": carried}
+    (out_dir / REVISIT_MARKER).write_text(json.dumps(marker, indent=2), encoding="utf-8")
+    lgg.i(f"Deferred {len(urls)} pages to a later run; carried {len(carried)} files forward.")
+    return carried
@@ -2,191 +2,393 @@
 PATH: ./wix-scraper/utils/
 
 Functions:
-- main(): Orchestrates the full scraping workflow, including PDF extraction and diff generation.
-- process_page(context, url, to_visit, visited, pdf_queue): Navigates a page, handles authentication, saves text, and enqueues new links.
-- url_to_filename(u): Converts a URL into a safe filename.
-- is_same_domain(u): Checks if a URL is from the same domain as the starting point.
+- main(events, sites, crawls, report, commit): Orchestrates the full scraping workflow, including PDF extraction and diff generation.
+  Every site from Settings.site_configs() (or `sites`) gets its own frontier, browser context and
+  output subdir; all of them share one Chromium instance and one pool of page workers.
+  If an `events` queue is given, a PageEvent is put on it for every saved file and None once the crawl ends.
+  Prebuilt `crawls` (e.g. with a shared utils.shard.SQLiteFrontier) replace the per-site defaults;
+  report=False leaves run reports and the metrics endpoint to the caller.
+  Files go through one utils.snapshots.SnapshotWriter into results/<ts>.partial/; commit=True
+  renames that to results/<ts>/ (manifest + .complete marker) once everything is written.
+  If any file could not be written, the staging dir is left uncommitted and SnapshotNotCommitted
+  is raised after the run report.
+- Frontier: Pending/visited/in-flight URL bookkeeping for one site, in memory.
+- SiteCrawl(site, out_dir): Per-site state (config, frontier, trap detector, staging dir, metrics, PDF queue).
+  With REVISIT on, the frontier is a budgeted utils.revisit.PriorityFrontier seeded with last
+  run's pages, and deferred pages are carried forward from the previous snapshot at the end.
+- RoundRobin: Hands the shared workers URLs from each site in turn.
+- process_page(crawl, context, url): Navigates a page, handles authentication, saves text, and enqueues new links.
+- site_name(site): Label and metrics key for a site (its out_subdir, else the start URL's host).
+- url_to_filename(u): Converts a URL into a safe filename (see utils.urlcanon).
+- RUN_REPORT: Name of the JSON run report (utils.metrics.RunMetrics) written into each site's dir.
+- is_same_domain(u, start_url): Checks if a URL is from the same domain as the starting point.
 """
 
+import argparse
 import asyncio
 import logging
-import re
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urldefrag, urljoin, urlparse
 
-import aiofiles
 from bs4 import BeautifulSoup
-from playwright.async_api import BrowserContext, Response, TimeoutError, async_playwright
+from playwright.async_api import BrowserContext, Request, Response, TimeoutError, async_playwright
 from playwright_stealth import Stealth
 
-from utils.configs.config import settings
+from utils.configs.config import CrawlSettings, SiteConfig, get_settings
+from utils.metrics import RunMetrics, serve_metrics
+from utils.multimedia.pdfbackends import PAGE_CACHE, PDFExtractor
 from utils.multimedia.pdfhandler import PDFHandler  # NEW
+from utils.profiling import add_profile_args, mark_stage, profiled
+from utils.revisit import PriorityFrontier, RevisitModel, carry_forward
+from utils.snapshots import (
+    RESULTS_ROOT,
+    RUN_REPORT,
+    SnapshotNotCommitted,
+    SnapshotWriter,
+    commit_snapshot,
+    latest_snapshot,
+    split_snapshot,
+    staging_dir,
+)
+from utils.urlcanon import TrapDetector, url_to_filename
 
-START_URL = settings.start_url
-WIX_PASSWORD = settings.wix_password
-URL_BLACKLIST = settings.url_blacklist
-CONCURRENCY = 5
-BASE_DIR = Path(__file__).resolve().parents[1]  # /wix-scraper/
-RESULTS_ROOT = BASE_DIR / "results"
+PDF_WORKERS = 3  # per site
 TIMESTAMP = datetime.now().strftime("%y%m%d-%H%M%S")
 OUT_DIR = RESULTS_ROOT / TIMESTAMP
-PDF_DIR = OUT_DIR / "pdf"
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s: %(message)s",
 )
-metrics = {
-    "pages_queued": 0,
-    "pages_done": 0,
-    "pdfs_downloaded": 0,
-    "retries": 0,
-    "failures": 0,
-}
 
 
-async def main():
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    visited, to_visit = set(), {START_URL}
-    pdf_queue = asyncio.Queue()
+class Frontier:
+    def __init__(self, seeds: list[str], blacklist: list[str]):
+        self.pending: set[str] = set(seeds)
+        self.visited: set[str] = set()
+        self.blacklist = set(blacklist)
+        self.in_flight = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.pending and self.in_flight == 0
+
+    def add(self, url: str):
+        if url not in self.visited:
+            self.pending.add(url)
+
+    def pop(self) -> str | None:
+        while self.pending:
+            url = self.pending.pop()
+            if not url or url in self.visited or url in self.blacklist:
+                continue
+            self.visited.add(url)
+            self.in_flight += 1
+            return url
+        return None
+
+    def done(self, url: str):
+        self.in_flight -= 1
+
+    def requeue(self, url: str):
+        self.visited.discard(url)
+        self.pending.add(url)
+
+
+class SiteCrawl:
+    def __init__(self, site: SiteConfig, out_dir: Path):
+        settings = get_settings(CrawlSettings)
+        self.site = site
+        self.name = site_name(site)
+        self.out_dir = staging_dir(out_dir)  # commit_snapshot() moves it to out_dir at the end
+        self.pdf_dir = self.out_dir / "pdf"
+        self.canonicalize = settings.canonicalize
+        self.start_url = self.canonicalize(site.start_url)
+        self.blacklist = [self.canonicalize(u) for u in site.url_blacklist if u]
+        self.traps = TrapDetector(
+            settings.url_max_depth, settings.url_template_cap, settings.url_trap_patterns
+        )
+        self.traps.check(self.start_url)
+        self.seeds = [self.start_url]
+        self.frontier = Frontier(self.seeds, self.blacklist)
+
+        self.revisit: RevisitModel | None = None
+        self.previous_dir: Path | None = None
+        if settings.revisit:
+            root, subdir = split_snapshot(out_dir)
+            self.revisit = RevisitModel.learn(
+                root.parent, subdir, current=root, history=settings.revisit_history
+            )
+            previous = latest_snapshot(root.parent, before=root)
+            self.previous_dir = previous / subdir if previous else None
+            # Re-seed with last run's pages so ones only linked from deferred pages are not lost.
+            for url in map(self.canonicalize, self.revisit.known_urls):
+                if urlparse(url).netloc == urlparse(self.start_url).netloc:
+                    if url not in self.seeds and self.traps.check(url) is None:
+                        self.seeds.append(url)
+            self.frontier = PriorityFrontier(
+                self.seeds,
+                self.blacklist,
+                self.revisit.priority,
+                settings.revisit_max_pages,
+                settings.revisit_max_minutes * 60,
+            )
+        self.metrics = RunMetrics(labels={"site": self.name})
+        self.pdf_queue: asyncio.Queue = asyncio.Queue()
+        self.context: BrowserContext | None = None
+        self.writer: SnapshotWriter | None = None
+
+    def is_same_domain(self, u: str) -> bool:
+        return is_same_domain(u, self.start_url)
+
+
+class RoundRobin:
+    def __init__(self, crawls: list[SiteCrawl]):
+        self.crawls = deque(crawls)
+
+    @property
+    def exhausted(self) -> bool:
+        return all(crawl.frontier.exhausted for crawl in self.crawls)
+
+    def next(self) -> tuple[SiteCrawl, str] | None:
+        for _ in range(len(self.crawls)):
+            crawl = self.crawls[0]
+            self.crawls.rotate(-1)
+            url = crawl.frontier.pop()
+            if url is not None:
+                return crawl, url
+        return None
+
+
+async def main(
+    events: asyncio.Queue | None = None,
+    sites: list[SiteConfig] | None = None,
+    crawls: list[SiteCrawl] | None = None,
+    report: bool = True,
+    commit: bool = True,
+):
+    settings = get_settings(CrawlSettings)
+    if crawls is None:
+        sites = sites or settings.site_configs()
+        crawls = [SiteCrawl(site, OUT_DIR / site.out_subdir) for site in sites]
+    writer = SnapshotWriter(events)
+    for crawl in crawls:
+        crawl.out_dir.mkdir(parents=True, exist_ok=True)
+        crawl.writer = writer
+
+    metrics_server = None
+    if report and settings.metrics_port:
+        metrics_server = serve_metrics(settings.metrics_port, [c.metrics for c in crawls])
+
+    extractor = PDFExtractor(
+        settings.pdf_backend, settings.pdf_max_pages, RESULTS_ROOT / PAGE_CACHE
+    )
 
     async with Stealth().use_async(async_playwright()) as pw:
         browser = await pw.chromium.launch(headless=True)
-        context = await browser.new_context()
-        sem = asyncio.Semaphore(CONCURRENCY)
-
-        # PDF handler
-        pdf_handler = PDFHandler(PDF_DIR, pdf_queue, context, metrics)
-        pdf_worker_task = asyncio.create_task(pdf_handler.run_workers(3))
-
-        async def handle_response(res: Response):
-            ctype = res.headers.get("content-type", "")
-            if "application/pdf" in ctype.lower():
-                await pdf_queue.put(res.url)
-
-        context.on("response", handle_response)
+        pdf_tasks = []
+
+        for crawl in crawls:
+            # One context per site keeps each site's password-wall cookies separate.
+            context = await browser.new_context()
+            crawl.context = context
+            pdf_handler = PDFHandler(
+                crawl.pdf_dir, crawl.pdf_queue, context, writer, crawl.metrics, extractor
+            )
+            pdf_tasks.append(asyncio.create_task(pdf_handler.run_workers(PDF_WORKERS)))
+
+            async def handle_response(res: Response, crawl: SiteCrawl = crawl):
+                ctype = res.headers.get("content-type", "")
+                if "application/pdf" in ctype.lower():
+                    await crawl.pdf_queue.put(res.url)
+
+            async def count_bytes(req: Request, crawl: SiteCrawl = crawl):
+                # Body bytes as transferred; content-length misses chunked and HTTP/2 responses.
+                try:
+                    size = (await req.sizes())["responseBodySize"]
+                except Exception:
+                    return  # its page closed before the sizes could be read
+                crawl.metrics.incr("bytes_received", max(size, 0))
+
+            context.on("response", handle_response)
+            context.on("requestfinished", count_bytes)
+
+        scheduler = RoundRobin(crawls)
 
         async def worker():
-            while to_visit:
-                url = to_visit.pop()
-                if not url or url in visited or url in URL_BLACKLIST:
+            while True:
+                picked = scheduler.next()
+                if picked is None:
+                    if scheduler.exhausted:
+                        return
+                    await asyncio.sleep(0.1)  # other workers may still discover links
                     continue
-                visited.add(url)
-                async with sem:
+
+                crawl, url = picked
+                try:
                     if url.lower().endswith(".pdf"):
-                        await pdf_queue.put(url)
+                        await crawl.pdf_queue.put(url)
                     else:
-                        try:
-                            await process_page(context, url, to_visit, visited, pdf_queue)
-                        except Exception as e:
-                            metrics["failures"] += 1
-                            logging.warning("Error processing page %s: %s", url, e, exc_info=True)
-                metrics["pages_queued"] = len(to_visit)
-                logging.info(
-                    "Metrics: queued=%d, done_pages=%d, done_pdfs=%d, retries=%d, failures=%d",
-                    metrics["pages_queued"],
-                    metrics["pages_done"],
-                    metrics["pdfs_downloaded"],
-                    metrics["retries"],
-                    metrics["failures"],
-                )
-
-        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
-
-        await pdf_queue.join()
-        for _ in range(3):
-            await pdf_queue.put(None)  # shut down signal
-
-        await pdf_worker_task
+                        await process_page(crawl, crawl.context, url)
+                except Exception as e:
+                    crawl.metrics.incr("failures")
+                    logging.warning("Error processing page %s: %s", url, e, exc_info=True)
+                finally:
+                    crawl.frontier.done(url)
+
+                crawl.metrics.set_gauge("pages_queued", len(crawl.frontier))
+                crawl.metrics.set_gauge("pdf_queue_depth", crawl.pdf_queue.qsize())
+                logging.info("Metrics [%s]: %s", crawl.name, crawl.metrics.summary_line())
+
+        await asyncio.gather(*(worker() for _ in range(settings.crawl_concurrency)))
+        mark_stage("pages_done")
+
+        for crawl in crawls:
+            await crawl.pdf_queue.join()
+            for _ in range(PDF_WORKERS):
+                await crawl.pdf_queue.put(None)  # shut down signal
+
+        await asyncio.gather(*pdf_tasks)
+        mark_stage("pdfs_done")
         await browser.close()
-
-
-async def process_page(
-    context: BrowserContext, url: str, to_visit: set, visited: set, pdf_queue: asyncio.Queue
-):
-    retry_page = False
+    await writer.close()
+
+    for crawl in crawls:
+        if isinstance(crawl.frontier, PriorityFrontier):
+            deferred = crawl.frontier.deferred
+            carried = carry_forward(deferred, crawl.previous_dir, crawl.out_dir)
+            crawl.metrics.set_gauge("pages_deferred", len(deferred))
+            crawl.metrics.set_gauge("files_carried_forward", len(carried))
+
+    if report:
+        for crawl in crawls:
+            crawl.metrics.write_report(crawl.out_dir / RUN_REPORT)
+            logging.info("Run report written to %s", crawl.out_dir / RUN_REPORT)
+    if commit and not writer.failures:
+        commit_snapshot(crawls[0].out_dir, writer.hashes)
+    if metrics_server:
+        metrics_server.shutdown()
+
+    if events is not None:
+        await events.put(None)  # end of stream
+    if writer.failures:
+        # Committing would present the missing files as pages the site removed.
+        raise SnapshotNotCommitted(
+            f"{writer.failures} files could not be written; "
+            f"{staging_dir(crawls[0].out_dir)} was left uncommitted."
+        )
+
+
+async def process_page(crawl: SiteCrawl, context: BrowserContext, url: str):
+    metrics = crawl.metrics
 
     logging.info(f"Visiting page {url}")
 
     page = await context.new_page()
 
     try:
-        await page.goto(url, wait_until="networkidle", timeout=45000)
+        with metrics.timer(url, "navigate"):
+            await page.goto(url, wait_until="networkidle", timeout=45000)
     except Exception as e:
         logging.warning("Error navigating to %s: %s", url, e, exc_info=True)
         await page.close()
-        metrics["failures"] += 1
+        metrics.incr("failures")
         return
 
     try:
-        selector = 'input[type="password"]'
-        if await page.query_selector(selector):
-            await page.fill(selector, WIX_PASSWORD)
-            await page.keyboard.press("Enter")
-            await page.locator(selector).wait_for(state="detached", timeout=9999)
-            await page.locator("#SITE_CONTAINER").wait_for(state="visible", timeout=10000)
-            await page.wait_for_load_state("networkidle", timeout=30001)
+        with metrics.timer(url, "password_wall"):
+            selector = 'input[type="password"]'
+            if await page.query_selector(selector):
+                await page.fill(selector, crawl.site.wix_password)
+                await page.keyboard.press("Enter")
+                await page.locator(selector).wait_for(state="detached", timeout=9999)
+                await page.locator("#SITE_CONTAINER").wait_for(state="visible", timeout=10000)
+                await page.wait_for_load_state("networkidle", timeout=30001)
     except TimeoutError as te:
         logging.warning("Timeout error on %s - accepting partial download - {%s}", url, te)
     except Exception as e:
         logging.warning("Password entry failed for %s: %s", url, e, exc_info=True)
 
     texts = []
-    for frame in page.frames:
-        try:
-            body_txt = await frame.evaluate("document.body && document.body.innerText")
-            if body_txt:
-                texts.append(body_txt.strip())
-        except Exception:
-            pass
+    with metrics.timer(url, "extract"):
+        for frame in page.frames:
+            try:
+                body_txt = await frame.evaluate("document.body && document.body.innerText")
+                if body_txt:
+                    texts.append(body_txt.strip())
+            except Exception:
+                pass
 
     first_line = texts[0].splitlines()[0] if texts else ""
     if first_line.strip() in {"ERROR: FORBIDDEN", "Password Protected"}:
         logging.warning("Access denied on %s - queued for retry", url)
-        visited.remove(url)
-        to_visit.add(url)
+        crawl.frontier.requeue(url)
         await page.close()
         await asyncio.sleep(5)
-        metrics["retries"] += 1
+        metrics.incr("retries")
         return
 
     fname = url_to_filename(url)
-    text_path = OUT_DIR / f"{fname}.txt"
-    async with aiofiles.open(text_path, "w", encoding="utf-8") as f:
-        await f.write("\n\n".join(texts))
-    logging.info("Text saved: %s", fname)
-    metrics["pages_done"] += 1
-
-    html = await page.content()
-    for link in BeautifulSoup(html, "html.parser").find_all("a", href=True):
-        u = urljoin(url, link["href"])
-        u, _ = urldefrag(u)
-        if is_same_domain(u) and u not in visited:
-            to_visit.add(u)
-
-    tabs = await page.get_by_role("tab").all()
-    for tab in tabs:
-        try:
-            await tab.click()
-            await page.wait_for_timeout(500)
-        except Exception as e:
-            metrics["failures"] += 1
-            logging.warning("Tab click failed for %s: %s", url, e, exc_info=True)
+    text_path = crawl.out_dir / f"{fname}.txt"
+    text = "\n\n".join(texts)
+    data = text.encode("utf-8")
+    with metrics.timer(url, "save"):
+        await crawl.writer.write(text_path, data)  # the writer emits the PageEvent once on disk
+    logging.info("Text queued: %s", fname)
+    metrics.incr("pages_done")
+    metrics.incr("bytes_written", len(data))
+    metrics.record_page(url, file=text_path.name, bytes=len(data), frames=len(texts))
+
+    with metrics.timer(url, "links"):
+        html = await page.content()
+        for link in BeautifulSoup(html, "html.parser").find_all("a", href=True):
+            raw, _ = urldefrag(urljoin(url, link["href"]))
+            u = crawl.canonicalize(raw)
+            if u != raw:
+                metrics.incr("links_canonicalized")
+            if not crawl.is_same_domain(u):
+                continue
+            reason = crawl.traps.check(u)
+            if reason:
+                metrics.incr(f"links_rejected_{reason}")
+                continue
+            crawl.frontier.add(u)
+
+    with metrics.timer(url, "tabs"):
+        tabs = await page.get_by_role("tab").all()
+        for tab in tabs:
+            try:
+                await tab.click()
+                await page.wait_for_timeout(500)
+            except Exception as e:
+                metrics.incr("failures")
+                logging.warning("Tab click failed for %s: %s", url, e, exc_info=True)
 
     await page.close()
 
 
-def url_to_filename(u: str) -> str:
-    return re.sub(r"[^\w\-]+", "_", u)[:180]
+def site_name(site: SiteConfig) -> str:
+    return site.out_subdir or urlparse(site.start_url).netloc
 
 
-def is_same_domain(u: str) -> bool:
-    if urlparse(u).netloc != urlparse(START_URL).netloc:
+def is_same_domain(u: str, start_url: str) -> bool:
+    if urlparse(u).netloc != urlparse(start_url).netloc:
         logging.warning(f"Detected link to external domain: {u}")
         return False
     return True
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Crawl the site(s) into results/<timestamp>.")
+    parser.add_argument("--sites-file", help="JSON list of site configs (overrides SITES_FILE)")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    # Not the run dir: it only appears at commit, and a failed run must not leave one behind.
+    with profiled(args.profile, args.profile_dir or RESULTS_ROOT, "scrape"):
+        asyncio.run(main(sites=get_settings(CrawlSettings).site_configs(args.sites_file)))
@@ -2,7 +2,6 @@
 PATH: ./wix-scraper/utils/
 """
 
-
 import argparse
 import base64
 import mimetypes
@@ -20,7 +19,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-from utils.configs.config import settings
+from utils.configs.config import EmailSettings, get_settings
+from utils.profiling import add_profile_args, profiled
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.compose"]
 
@@ -32,6 +32,7 @@ def gmail_send_message(folder_path: Path):
 
     Load pre-authorized user credentials from the environment.
     """
+    settings = get_settings(EmailSettings)
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -101,10 +102,12 @@ if __name__ == "__main__":
         type=str,
         help="Path to the folder containing attachments",
     )
+    add_profile_args(parser)
     args = parser.parse_args()
 
     folder_path = Path(args.folder)
     if not folder_path.is_dir():
         parser.error(f"{folder_path!r} is not a valid directory")
 
-    gmail_send_message(folder_path)
+    with profiled(args.profile, args.profile_dir or folder_path, "send_email"):
+        gmail_send_message(folder_path)
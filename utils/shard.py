@@ -0,0 +1,508 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Sharded crawl: one coordinator and N crawler processes sharing a SQLite frontier.
+
+URLs are partitioned by crc32(url) % shards; each worker leases pending URLs from its own shard
+(and any lease that expired because its worker died), and inserts every discovered link into
+whichever shard owns it. All workers write into the same results/<timestamp>/<site>/ layout as
+utils.scrape (staged as results/<timestamp>.partial/) and push their RunMetrics into the database
+every few seconds (a bounded summary plus the pages touched since the last push); the coordinator
+merges them into the usual .run_report.json per site, serves METRICS_PORT, and commits the
+snapshot only if the whole frontier was crawled and every worker finished cleanly. A page is
+marked done once it is handed to the write-behind queue (and a PDF link once it is queued for
+download), so a worker that exits non-zero, fails, or goes silent may take files with it that no
+lease will bring back; its run is left uncommitted.
+
+Links are canonicalised the same way as in a single-process crawl; trap-detector template caps
+(utils.urlcanon) are counted per worker, so a sharded run may take up to shards x cap pages of
+one template. With REVISIT on, workers order their shard by utils.revisit priorities and seed last
+run's pages; the page/time budget only applies to single-process crawls.
+
+The database and the snapshot dir must be visible to every worker: on one box that is automatic,
+across nodes put both on a shared filesystem with working POSIX locks, start the coordinator with
+--no-spawn --shared-fs and the remote workers by hand with
+`python -m utils.shard worker --db <path> --shard <i>`. The frontier normally runs in WAL mode,
+whose shared-memory index only works between processes on one host; --shared-fs switches it to a
+rollback journal (slower, but every write goes through file locks). The mode is stored in the
+database file, so workers pick up whichever one the coordinator chose.
+
+Functions:
+- SQLiteFrontier(db, site, shard, shards, owner, blacklist): Drop-in for scrape.Frontier.
+- ShardDB(path, journal_mode): Schema, run metadata (out dir, shard count, sites) and pushed worker
+  metrics. journal_mode=None keeps the mode the database file already has.
+- shard_of(url, shards): Stable shard number for a URL.
+- coordinate(shards, sites, out_dir, spawn, db_path, shared_fs): Seeds the frontier,
+  runs/monitors the workers, writes the merged run reports and commits the snapshot.
+- run_worker(db_path, shard): Crawls one shard until the whole frontier is exhausted.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import zlib
+from collections.abc import Callable
+from pathlib import Path
+
+from utils.configs.config import CrawlSettings, SiteConfig, get_settings
+from utils.configs.logs import setup_logger
+from utils.metrics import RunMetrics, serve_metrics
+from utils.profiling import add_profile_args, profiled
+from utils.snapshots import RESULTS_ROOT, commit_snapshot, staging_dir
+
+lgg = setup_logger(logging.INFO)
+
+DB_NAME = ".frontier.sqlite"  # dot-prefixed so hash comparison ignores it
+LEASE_SECONDS = 600  # a page can take minutes (navigation, password wall, tabs)
+METRICS_PUSH_SECONDS = 5
+# Once the frontier is drained, a worker silent this long is taken for dead (--no-spawn runs).
+# Generous: a live worker may still be fetching PDFs, and committing under it loses files.
+WORKER_SILENCE_SECONDS = 24 * METRICS_PUSH_SECONDS
+POLL_SECONDS = 2
+# Per shard, for workers that exit non-zero before the crawl is done. A restart finishes the
+# frontier (run reports, a staging dir worth inspecting); the snapshot still is not committed.
+MAX_RESTARTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    site TEXT NOT NULL,
+    url TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',  -- pending | leased | done
+    priority REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    PRIMARY KEY (site, url)
+);
+CREATE INDEX IF NOT EXISTS urls_pick ON urls (site, shard, state, priority);
+CREATE TABLE IF NOT EXISTS run (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS metrics (
+    worker TEXT NOT NULL,
+    site TEXT NOT NULL,
+    report TEXT NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0,  -- finished by an exception
+    PRIMARY KEY (worker, site)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    worker TEXT NOT NULL,
+    site TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    PRIMARY KEY (worker, site, url)
+);
+"""
+
+
+def shard_of(url: str, shards: int) -> int:
+    return zlib.crc32(url.encode("utf-8")) % shards
+
+
+class ShardDB:
+    def __init__(self, path: Path, journal_mode: str | None = "WAL"):
+        self.path = Path(path)
+        # Autocommit; multi-statement updates open their own BEGIN IMMEDIATE.
+        self.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        if journal_mode:
+            self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if self.journal_mode == "wal":
+            self.conn.execute("PRAGMA synchronous=NORMAL")  # durable enough with WAL only
+        self.conn.executescript(SCHEMA)
+
+    def set_run(self, out_dir: Path, shards: int, sites: list[SiteConfig]):
+        rows = {
+            "out_dir": str(out_dir),
+            "shards": str(shards),
+            "sites": json.dumps([site.model_dump() for site in sites]),
+        }
+        self.conn.executemany("INSERT OR REPLACE INTO run VALUES (?, ?)", rows.items())
+
+    def run_info(self) -> tuple[Path, int, list[SiteConfig]]:
+        rows = dict(self.conn.execute("SELECT key, value FROM run"))
+        if not rows:
+            raise ValueError(f"{self.path} has no run metadata - start the coordinator first.")
+        sites = [SiteConfig(**site) for site in json.loads(rows["sites"])]
+        return Path(rows["out_dir"]), int(rows["shards"]), sites
+
+    def counts(self) -> dict[str, int]:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state"))
+
+    def exhausted(self) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM urls WHERE state IN ('pending', 'leased') LIMIT 1"
+        ).fetchone()
+        return row is None
+
+    def push_metrics(
+        self, worker: str, site: str, report: dict, finished: bool = False, failed: bool = False
+    ):
+        """`report` is RunMetrics.delta(): the bounded summary replaces the worker's last one,
+        and only the pages it carries are upserted, so pushes stay cheap on long crawls."""
+        pages = report.pop("pages", {})
+        finished = finished or failed
+        with _Transaction(self.conn):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)",
+                (worker, site, json.dumps(report), int(finished), time.time(), int(failed)),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                [(worker, site, url, json.dumps(fields)) for url, fields in pages.items()],
+            )
+
+    def merged_metrics(self, pages: bool = False) -> dict[str, RunMetrics]:
+        """Per-page timings are only needed for the final run reports, so polls skip them."""
+        merged: dict[str, RunMetrics] = {}
+        for site, report in self.conn.execute("SELECT site, report FROM metrics"):
+            registry = merged.setdefault(site, RunMetrics(labels={"site": site}))
+            registry.merge({**json.loads(report), "pages": {}})
+        if pages:
+            for site, url, fields in self.conn.execute("SELECT site, url, fields FROM pages"):
+                registry = merged.setdefault(site, RunMetrics(labels={"site": site}))
+                registry.record_page(url, **json.loads(fields))
+        return merged
+
+    def silent_workers(self, max_silence: float) -> list[str]:
+        """Unfinished workers that have not pushed metrics for max_silence seconds."""
+        rows = self.conn.execute(
+            "SELECT DISTINCT worker FROM metrics WHERE finished = 0 AND updated < ?",
+            (time.time() - max_silence,),
+        )
+        return [worker for (worker,) in rows]
+
+    def failed_workers(self) -> list[str]:
+        rows = self.conn.execute("SELECT DISTINCT worker FROM metrics WHERE failed = 1")
+        return [worker for (worker,) in rows]
+
+    def workers_finished(self, max_silence: float | None = None) -> bool:
+        """Every worker seen has finished; with max_silence, silent ones count as finished."""
+        since = time.time() - max_silence if max_silence is not None else 0.0
+        total, running = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(finished = 0 AND updated >= ?), 0) FROM metrics",
+            (since,),
+        ).fetchone()
+        return total > 0 and running == 0
+
+
+class SQLiteFrontier:
+    """Same interface as utils.scrape.Frontier, backed by the shared urls table."""
+
+    def __init__(
+        self,
+        db: ShardDB,
+        site: str,
+        shard: int,
+        shards: int,
+        owner: str,
+        blacklist: list[str] | None = None,
+        priority: Callable[[str], float] | None = None,
+    ):
+        self.db = db
+        self.site = site
+        self.shard = shard
+        self.shards = shards
+        self.owner = owner
+        self.blacklist = set(blacklist or [])
+        self.priority = priority  # e.g. utils.revisit.RevisitModel.priority
+        self.in_flight = 0
+        self._added: set[str] = set()  # already sent to the db by this process
+        self._buffer: list[tuple[str, str, int, float]] = []
+
+    def __len__(self) -> int:
+        self._flush()
+        return self.db.conn.execute(
+            "SELECT COUNT(*) FROM urls WHERE site = ? AND shard = ? AND state = 'pending'",
+            (self.site, self.shard),
+        ).fetchone()[0]
+
+    @property
+    def exhausted(self) -> bool:
+        # Global on purpose: another shard's page can still add links to this one.
+        self._flush()
+        row = self.db.conn.execute(
+            "SELECT 1 FROM urls WHERE site = ? AND state IN ('pending', 'leased') LIMIT 1",
+            (self.site,),
+        ).fetchone()
+        return row is None and self.in_flight == 0
+
+    def add(self, url: str, priority: float = 0.0):
+        if not url or url in self.blacklist or url in self._added:
+            return
+        self._added.add(url)
+        if self.priority is not None:
+            priority = self.priority(url)
+        self._buffer.append((self.site, url, shard_of(url, self.shards), priority))
+
+    def _flush(self):
+        # Links arrive a page at a time; one transaction per page instead of one per link.
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+        with self._transaction():
+            self.db.conn.executemany(
+                "INSERT OR IGNORE INTO urls (site, url, shard, priority) VALUES (?, ?, ?, ?)",
+                buffer,
+            )
+
+    def pop(self) -> str | None:
+        self._flush()
+        now = time.time()
+        with self._transaction():
+            row = self.db.conn.execute(
+                """
+                SELECT url FROM urls
+                WHERE site = ?
+                  AND ((shard = ? AND state = 'pending') OR (state = 'leased' AND lease_until < ?))
+                ORDER BY priority DESC
+                LIMIT 1
+                """,
+                (self.site, self.shard, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.conn.execute(
+                """
+                UPDATE urls SET state = 'leased', lease_owner = ?, lease_until = ?,
+                                attempts = attempts + 1
+                WHERE site = ? AND url = ?
+                """,
+                (self.owner, now + LEASE_SECONDS, self.site, row[0]),
+            )
+        self.in_flight += 1
+        return row[0]
+
+    def done(self, url: str):
+        self.in_flight -= 1
+        # A requeue() during the page leaves the row pending; only a live lease is completed.
+        self.db.conn.execute(
+            """
+            UPDATE urls SET state = 'done', lease_owner = NULL, lease_until = NULL
+            WHERE site = ? AND url = ? AND state = 'leased' AND lease_owner = ?
+            """,
+            (self.site, url, self.owner),
+        )
+
+    def requeue(self, url: str):
+        self.db.conn.execute(
+            """
+            UPDATE urls SET state = 'pending', lease_owner = NULL, lease_until = NULL
+            WHERE site = ? AND url = ?
+            """,
+            (self.site, url),
+        )
+
+    def _transaction(self):
+        return _Transaction(self.db.conn)
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, *exc):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+
+async def _push_loop(db: ShardDB, worker_id: str, crawls):
+    while True:
+        await asyncio.sleep(METRICS_PUSH_SECONDS)
+        for crawl in crawls:
+            db.push_metrics(worker_id, crawl.name, crawl.metrics.delta())
+
+
+async def run_worker(db_path: Path, shard: int):
+    from utils import scrape
+
+    db = ShardDB(db_path, journal_mode=None)  # the coordinator chose it
+    out_dir, shards, sites = db.run_info()
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} is out of range for a {shards}-shard run.")
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-s{shard}"
+    crawls = [scrape.SiteCrawl(site, out_dir / site.out_subdir) for site in sites]
+    for crawl in crawls:
+        priority = crawl.revisit.priority if crawl.revisit else None
+        crawl.frontier = SQLiteFrontier(
+            db, crawl.name, shard, shards, worker_id, crawl.blacklist, priority
+        )
+        for url in crawl.seeds:
+            crawl.frontier.add(url)
+    lgg.i(f"Worker {worker_id}: shard {shard}/{shards} -> {out_dir}")
+
+    pusher = asyncio.create_task(_push_loop(db, worker_id, crawls))
+    failed = True
+    try:
+        await scrape.main(crawls=crawls, report=False, commit=False)
+        failed = False
+    finally:
+        pusher.cancel()
+        for crawl in crawls:
+            report = crawl.metrics.delta()
+            db.push_metrics(worker_id, crawl.name, report, finished=True, failed=failed)
+    lgg.i(f"Worker {worker_id} finished.")
+
+
+# ---------------------------------------------------------------------------
+# Coordinator
+# ---------------------------------------------------------------------------
+
+
+def _spawn(db_path: Path, shard: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "utils.shard", "worker", "--db", str(db_path)]
+    return subprocess.Popen([*cmd, "--shard", str(shard)])
+
+
+def coordinate(
+    shards: int,
+    sites: list[SiteConfig],
+    out_dir: Path,
+    spawn: bool = True,
+    db_path: Path | None = None,
+    shared_fs: bool = False,
+) -> dict[str, RunMetrics]:
+    from utils.scrape import RUN_REPORT, site_name
+
+    if shards < 1:
+        raise ValueError("Need at least one shard.")
+    staging = staging_dir(out_dir)
+    staging.mkdir(parents=True, exist_ok=True)
+    db_path = db_path or staging / DB_NAME
+    db = ShardDB(db_path, "DELETE" if shared_fs else "WAL")
+    db.set_run(out_dir, shards, sites)
+    settings = get_settings(CrawlSettings)
+    seeds = [(site_name(s), settings.canonicalize(s.start_url)) for s in sites]
+    db.conn.executemany(
+        "INSERT OR IGNORE INTO urls (site, url, shard) VALUES (?, ?, ?)",
+        [(name, url, shard_of(url, shards)) for name, url in seeds],
+    )
+
+    registries: list[RunMetrics] = []
+    metrics_server = (
+        serve_metrics(settings.metrics_port, registries) if settings.metrics_port else None
+    )
+
+    procs: dict[int, subprocess.Popen] = {}
+    restarts: dict[int, int] = {}
+    unclean: list[str] = []  # workers that may have lost queued PDFs or writes
+    if spawn:
+        procs = {shard: _spawn(db_path, shard) for shard in range(shards)}
+        lgg.i(f"Spawned {shards} workers on {db_path}")
+    else:
+        lgg.i(f"Waiting for workers: python -m utils.shard worker --db {db_path} --shard <i>")
+
+    last_log = 0.0
+    while True:
+        time.sleep(POLL_SECONDS)
+        registries[:] = db.merged_metrics().values()
+
+        for shard, proc in list(procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            del procs[shard]
+            if code != 0:
+                unclean.append(f"shard {shard} (exit {code})")
+            if code != 0 and not db.exhausted() and restarts.get(shard, 0) < MAX_RESTARTS:
+                restarts[shard] = restarts.get(shard, 0) + 1
+                lgg.w(f"Worker for shard {shard} exited with {code} - restarting")
+                procs[shard] = _spawn(db_path, shard)
+            elif code != 0:
+                lgg.er(f"Worker for shard {shard} exited with {code}")
+
+        if time.monotonic() - last_log > 10:
+            last_log = time.monotonic()
+            lgg.i(f"Frontier: {db.counts()} | live workers: {len(procs) if spawn else '?'}")
+
+        if spawn and not procs:
+            break
+        # A remote worker that died never pushes finished=1; its leases expire and are re-crawled,
+        # so once the frontier is drained it only has to have been quiet long enough.
+        if not spawn and db.exhausted() and db.workers_finished(WORKER_SILENCE_SECONDS):
+            silent = db.silent_workers(WORKER_SILENCE_SECONDS)
+            if silent:
+                lgg.w(f"Frontier drained; not waiting for silent workers {', '.join(silent)}")
+                unclean.extend(silent)
+            break
+
+    merged = db.merged_metrics(pages=True)
+    by_name = {site_name(site): site for site in sites}
+    for name, registry in merged.items():
+        report_path = staging / by_name[name].out_subdir / RUN_REPORT
+        registry.write_report(report_path)
+        lgg.i(f"Run report written to {report_path}")
+    if metrics_server:
+        metrics_server.shutdown()
+
+    unclean.extend(worker for worker in db.failed_workers() if worker not in unclean)
+    if unclean:
+        lgg.er(
+            f"Workers did not finish cleanly: {', '.join(unclean)}; files they still had queued "
+            f"may be missing, leaving {staging} uncommitted"
+        )
+    elif db.exhausted():
+        db.conn.close()
+        commit_snapshot(out_dir)
+    else:
+        # Committing would make every uncrawled page look "removed" to compare.
+        lgg.er(
+            f"Crawl ended with URLs left in the frontier: {db.counts()}; "
+            f"leaving {staging} uncommitted"
+        )
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded crawl over a shared SQLite frontier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coord = commands.add_parser("coordinate", help="Seed the frontier and run/monitor workers")
+    coord.add_argument("--shards", type=int, default=os.cpu_count() or 2)
+    coord.add_argument("--no-spawn", action="store_true", help="Workers are started elsewhere")
+    coord.add_argument("--db", type=Path, help=f"Frontier database (default: <run dir>/{DB_NAME})")
+    coord.add_argument(
+        "--shared-fs",
+        action="store_true",
+        help="Workers on other hosts share the database: use a rollback journal instead of WAL",
+    )
+    coord.add_argument("--sites-file", help="JSON list of site configs (overrides SITES_FILE)")
+    add_profile_args(coord)
+
+    work = commands.add_parser("worker", help="Crawl one shard")
+    work.add_argument("--db", type=Path, required=True)
+    work.add_argument("--shard", type=int, required=True)
+    add_profile_args(work)
+
+    args = parser.parse_args()
+    if args.command == "coordinate":
+        from utils.scrape import OUT_DIR
+
+        with profiled(args.profile, args.profile_dir or RESULTS_ROOT, "shard-coordinator"):
+            coordinate(
+                args.shards,
+                get_settings(CrawlSettings).site_configs(args.sites_file),
+                OUT_DIR,
+                spawn=not args.no_spawn,
+                db_path=args.db,
+                shared_fs=args.shared_fs,
+            )
+    else:
+        with profiled(args.profile, args.profile_dir or RESULTS_ROOT, f"shard-{args.shard}"):
+            asyncio.run(run_worker(args.db, args.shard))
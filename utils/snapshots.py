@@ -0,0 +1,229 @@
+"""
+PATH: ./wix-scraper/utils/
+
+Functions:
+- RESULTS_ROOT: results/ under the project, overridable with the RESULTS_ROOT env var.
+- is_snapshot_dir(path): Returns True if the path is a results/<YYMMDD-HHMMSS> snapshot directory.
+- snapshot_time(path): Parses the snapshot directory name into a datetime.
+- list_snapshots(results_root): Returns every snapshot directory under results_root, oldest first.
+- latest_snapshot(results_root, before): Returns the newest snapshot, optionally older than `before`.
+- split_snapshot(path): Splits results/<ts>/<site> into (results/<ts>, "<site>"); site is "" for
+  single-site snapshots and for directories outside the results layout. Staging dirs
+  (<ts>.partial) split to the path they will be committed to.
+- snapshot_label(path): "<ts>" or "<ts>/<site>", used to label diff hunks and exports.
+- PageEvent: (path, sha256) emitted by the scraper each time a file lands in the snapshot.
+- RUN_REPORT: Name of the JSON run report (utils.metrics.RunMetrics) in each site's snapshot dir.
+
+A crawl writes into results/<ts>.partial/ and commit_snapshot() renames it to results/<ts>/ once
+a .manifest.json (every file with its size and sha256) and a .complete marker are in place, so a
+crashed run never looks like a finished snapshot: list_snapshots() skips staging dirs and
+check_committed() refuses them.
+
+- staging_dir(path): results/<ts>.partial[/<site>] for results/<ts>[/<site>].
+- commit_snapshot(snapshot, hashes): Writes manifest + marker and renames the staging dir.
+- check_committed(path): Raises SnapshotNotCommitted for staging dirs; warns about (and returns
+  False for) snapshots written before commit markers existed.
+- SnapshotWriter(events, max_pending, batch_size): Write-behind queue for snapshot files; writes
+  in batches on a worker thread and emits each PageEvent once its file is on disk.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from utils.configs.logs import setup_logger
+
+lgg = setup_logger(logging.INFO)
+
+BASE_DIR = Path(__file__).resolve().parents[1]  # /wix-scraper/
+RESULTS_ROOT = Path(os.environ.get("RESULTS_ROOT") or BASE_DIR / "results").resolve()
+SNAPSHOT_FORMAT = "%y%m%d-%H%M%S"  # matches utils.scrape.TIMESTAMP
+SNAPSHOT_RE = re.compile(r"^\d{6}-\d{6}$")
+RUN_REPORT = ".run_report.json"  # dot-prefixed so hash comparison ignores it
+PARTIAL_SUFFIX = ".partial"
+MANIFEST = ".manifest.json"
+COMPLETE_MARKER = ".complete"
+
+
+class SnapshotNotCommitted(ValueError):
+    pass
+
+
+def is_snapshot_dir(path: Path) -> bool:
+    return path.is_dir() and bool(SNAPSHOT_RE.match(path.name))
+
+
+def snapshot_time(path: Path) -> datetime:
+    return datetime.strptime(path.name, SNAPSHOT_FORMAT)
+
+
+def list_snapshots(results_root: Path) -> list[Path]:
+    if not results_root.is_dir():
+        return []
+    return sorted((p for p in results_root.iterdir() if is_snapshot_dir(p)), key=snapshot_time)
+
+
+def latest_snapshot(results_root: Path, before: Path | None = None) -> Path | None:
+    snapshots = list_snapshots(results_root)
+    if before is not None:
+        cutoff = snapshot_time(before)
+        snapshots = [p for p in snapshots if snapshot_time(p) < cutoff]
+    return snapshots[-1] if snapshots else None
+
+
+def _snapshot_name(name: str) -> str | None:
+    name = name.removesuffix(PARTIAL_SUFFIX)
+    return name if SNAPSHOT_RE.match(name) else None
+
+
+def split_snapshot(path: Path) -> tuple[Path, str]:
+    path = Path(path).resolve()
+    name, parent = _snapshot_name(path.name), _snapshot_name(path.parent.name)
+    if name is None and parent is not None:
+        return path.parent.with_name(parent), path.name
+    if name is not None:
+        return path.with_name(name), ""
+    return path, ""
+
+
+def staging_dir(path: Path) -> Path:
+    root, site = split_snapshot(path)
+    return root.with_name(root.name + PARTIAL_SUFFIX) / site
+
+
+def snapshot_label(path: Path) -> str:
+    root, site = split_snapshot(path)
+    return f"{root.name}/{site}" if site else root.name
+
+
+class PageEvent(NamedTuple):
+    path: Path
+    sha256: str
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def commit_snapshot(snapshot: Path, hashes: dict[Path, str] | None = None) -> Path:
+    """`hashes` (staging path -> sha256, e.g. SnapshotWriter.hashes) saves re-reading those files."""
+    snapshot, _ = split_snapshot(snapshot)
+    staging = staging_dir(snapshot)
+    if snapshot.exists():
+        raise FileExistsError(f"{snapshot} already exists; not committing {staging} over it")
+
+    hashes = hashes or {}
+    files = {}
+    for path in sorted(staging.rglob("*")):
+        if path.is_file() and not path.name.startswith("."):
+            files[path.relative_to(staging).as_posix()] = {
+                "bytes": path.stat().st_size,
+                "sha256": hashes.get(path) or _sha256(path),
+            }
+    manifest = {
+        "snapshot": snapshot.name,
+        "committed": datetime.now().isoformat(timespec="seconds"),
+        "files": files,
+    }
+    (staging / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    (staging / COMPLETE_MARKER).touch()
+    staging.rename(
+        snapshot
+    )  # atomic on one filesystem: the snapshot appears complete or not at all
+    lgg.i(f"Committed snapshot {snapshot} ({len(files)} files)")
+    return snapshot
+
+
+def check_committed(path: Path) -> bool:
+    path = Path(path).resolve()
+    root, _ = split_snapshot(path)
+    staging = staging_dir(path)
+    if path == staging or (not path.exists() and staging.exists()):
+        raise SnapshotNotCommitted(
+            f"{staging} was never committed (crawl still running, or it crashed); "
+            "refusing to compare an incomplete snapshot"
+        )
+    if SNAPSHOT_RE.match(root.name) and not (root / COMPLETE_MARKER).is_file():
+        lgg.w(f"{root} has no {COMPLETE_MARKER} marker (written before commit markers existed?)")
+        return False
+    return True
+
+
+class SnapshotWriter:
+    def __init__(
+        self,
+        events: asyncio.Queue | None = None,
+        max_pending: int = 256,
+        batch_size: int = 64,
+    ):
+        self.queue: asyncio.Queue = asyncio.Queue(max_pending)  # full queue = crawl waits on disk
+        self.events = events
+        self.batch_size = batch_size
+        self.pending: set[Path] = set()
+        self.hashes: dict[Path, str] = {}  # every file written, for commit_snapshot's manifest
+        self.batches = 0
+        self.failures = 0
+        self._task: asyncio.Task | None = None
+
+    def exists(self, path: Path) -> bool:
+        return path in self.pending or path in self.hashes or path.exists()
+
+    async def write(self, path: Path, data: bytes, event: bool = True) -> str:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+        digest = hashlib.sha256(data).hexdigest()
+        self.pending.add(path)
+        await self.queue.put((path, data, digest, event))
+        return digest
+
+    async def close(self):
+        if self._task is not None:
+            await self.queue.put(None)
+            await self._task
+            self._task = None
+        lgg.i(
+            f"Snapshot writer: {len(self.hashes)} files in {self.batches} batches"
+            + (f", {self.failures} failed" if self.failures else "")
+        )
+
+    async def _flush_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            done = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                written = await asyncio.to_thread(self._write_batch, batch)
+                self.batches += 1
+                for path, _, digest, event in batch:
+                    self.pending.discard(path)
+                    if path not in written:
+                        continue
+                    self.hashes[path] = digest
+                    if event and self.events is not None:
+                        await self.events.put(PageEvent(path, digest))
+            if done:
+                return
+
+    def _write_batch(self, batch: list[tuple[Path, bytes, str, bool]]) -> set[Path]:
+        written = set()
+        for path, data, _, _ in batch:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+                written.add(path)
+            except OSError as e:
+                self.failures += 1
+                lgg.w(f"Snapshot write failed for {path}: {e}")
+        return written
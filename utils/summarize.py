@@ -5,21 +5,29 @@ PATH: ./wix-scraper/utils/
 import argparse
 import logging
 from datetime import datetime
+from functools import cache
 from pathlib import Path
 
 from jinja2 import BaseLoader, Environment
-from openai import OpenAI
 from tenacity import retry, stop_after_attempt, wait_random_exponential
 
-from utils.configs.config import settings, setup_logger
+from utils.configs.config import SummarySettings, get_settings
+from utils.configs.logs import setup_logger
 from utils.configs.prompt import MESSAGE_TEMPLATE, SUMMARY_PREAMBLE, SYSTEM_PROMPT
+from utils.profiling import add_profile_args, profiled
 
 lgg = setup_logger(logging.INFO)
 
 _jinja_env = Environment(loader=BaseLoader())
 _prompt_template = _jinja_env.from_string(MESSAGE_TEMPLATE)
 
-client = OpenAI(api_key=settings.openai_api_key)
+
+@cache
+def get_client():
+    # Built on first use: importing this module must not need OPENAI_API_KEY or the openai SDK.
+    from openai import OpenAI
+
+    return OpenAI(api_key=get_settings(SummarySettings).openai_api_key)
 
 
 def build_messages(text: str, from_date: str, to_date: str) -> list[dict[str, str]]:
@@ -34,8 +42,8 @@ def build_messages(text: str, from_date: str, to_date: str) -> list[dict[str, st
 
 @retry(wait=wait_random_exponential(max=60), stop=stop_after_attempt(1))
 def summarize_diff(text: str, from_date: str, to_date: str) -> str:
-    response = client.responses.create(
-        model=settings.openai_model_version,
+    response = get_client().responses.create(
+        model=get_settings(SummarySettings).openai_model_version,
         input=build_messages(text, from_date, to_date),
         temperature=0,
     )
@@ -70,6 +78,7 @@ if __name__ == "__main__":
         type=str,
         help="Path to the diff file",
     )
+    add_profile_args(parser)
     args = parser.parse_args()
 
     filepath = Path(args.filepath)
@@ -85,4 +94,5 @@ if __name__ == "__main__":
             f"{filepath!r} does not have the expect format <date_from>_<date_to>.diff.txt"
         )
 
-    main(filepath, from_date, to_date)
+    with profiled(args.profile, args.profile_dir or filepath.parent, "summarize"):
+        main(filepath, from_date, to_date)
@@ -0,0 +1,184 @@
+"""
+PATH: ./wix-scraper/utils/
+
+URL canonicalisation, crawl-trap detection and collision-free snapshot filenames.
+
+Every link the crawler finds goes through canonicalize() before it reaches the frontier, so
+query-string reorderings, tracking parameters, trailing slashes, host/path case and default
+ports no longer cost a render each. TrapDetector then rejects links that are too deep, match a
+known trap pattern (calendar day/month views, date query params) or belong to a path template that has
+already produced its quota of pages (`/blog/page/{n}`, `?date={v}`...).
+
+Functions:
+- canonicalize(url, strip_params, lowercase_path): Normal form of a URL; equal forms are one page.
+- url_template(url): Shape of a URL with numbers, dates, ids and query values abstracted away.
+- TrapDetector(max_depth, template_cap, patterns): check(url) -> rejection reason or None.
+- url_to_filename(u): Snapshot filename for a URL; names that sanitising could make ambiguous, and
+  long ones, keep a hash of the full URL.
+"""
+
+import hashlib
+import logging
+import re
+from collections import Counter
+from fnmatch import fnmatchcase
+from string import ascii_letters, digits
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+FILENAME_MAX = 180
+HASH_LEN = 12
+
+# Glob patterns matched against query parameter names (case-insensitive).
+DEFAULT_STRIP_PARAMS = [
+    "utm_*",
+    "gclid",
+    "gclsrc",
+    "dclid",
+    "fbclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "igshid",
+    "ref",
+    "ref_src",
+    "lightbox",  # Wix popup state, same page underneath
+]
+
+# Regexes searched in the canonical URL; a hit rejects the link outright.
+DEFAULT_TRAP_PATTERNS = [
+    r"[?&](month|year|day|date|week)=",  # calendar widgets paging through time
+    # Calendar views: a path segment that is only a date (/events/2024-05-01, /calendar/2024-05).
+    # Slugs that start with one (/events/2024-05-spring-gala) are real pages and stay.
+    r"/(calendar|events?)/(.+/)?\d{4}-\d{2}(-\d{2})?(/|\?|$)",
+    r"/(\d{4})/(\d{2})/(\d{2})/\1/",  # repeated date segments from relative links
+]
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_UNRESERVED = set(ascii_letters + digits + "-._~")
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_PLAIN_PATH = re.compile(r"^(/[^\W_]+(-+[^\W_]+)*)*/?$")
+_SEGMENT_RULES = [
+    (re.compile(r"^\d{4}-\d{2}(-\d{2})?$"), "{date}"),
+    (re.compile(r"^\d+$"), "{n}"),
+    (re.compile(r"^[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}$", re.IGNORECASE), "{id}"),
+    (re.compile(r"^(?=.*\d)[0-9a-f]{16,}$", re.IGNORECASE), "{id}"),
+]
+
+
+def _stripped(name: str, strip_params: list[str]) -> bool:
+    lowered = name.lower()
+    return any(fnmatchcase(lowered, pattern.lower()) for pattern in strip_params)
+
+
+def _normalize_escape(match: re.Match) -> str:
+    # %7E and ~ are the same URL; %2F is not the same as /, so only unreserved chars decode.
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else f"%{match.group(1).upper()}"
+
+
+def canonicalize(
+    url: str,
+    strip_params: list[str] | None = None,
+    lowercase_path: bool = True,
+) -> str:
+    strip_params = DEFAULT_STRIP_PARAMS if strip_params is None else strip_params
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if lowercase_path:
+        path = path.lower()
+    if len(path) > 1:
+        path = path.rstrip("/")
+    path = _ESCAPE.sub(_normalize_escape, path)
+
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _stripped(name, strip_params)
+    ]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def url_template(url: str) -> str:
+    parts = urlsplit(url)
+    segments = []
+    for segment in parts.path.split("/"):
+        for pattern, placeholder in _SEGMENT_RULES:
+            if pattern.match(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    keys = sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    query = "&".join(f"{key}={{v}}" for key in keys)
+    return f"{parts.netloc}{'/'.join(segments)}" + (f"?{query}" if query else "")
+
+
+class TrapDetector:
+    def __init__(
+        self,
+        max_depth: int = 8,
+        template_cap: int = 100,
+        patterns: list[str] | None = None,
+    ):
+        self.max_depth = max_depth
+        self.template_cap = template_cap  # 0 disables the cap
+        self.patterns = [
+            re.compile(p) for p in (DEFAULT_TRAP_PATTERNS if patterns is None else patterns)
+        ]
+        self.templates: Counter[str] = Counter()
+        self.seen: set[str] = set()
+        self.rejected: dict[str, str] = {}  # url -> reason
+
+    def check(self, url: str) -> str | None:
+        """Returns why `url` should not be crawled, or None (and counts it toward its template)."""
+        if url in self.seen:
+            return None
+        if url in self.rejected:
+            return self.rejected[url]
+        reason = self._reason(url)
+        if reason is None:
+            self.seen.add(url)
+        else:
+            # Once per URL, so a pattern that also catches real pages is visible in the log.
+            self.rejected[url] = reason
+            logger.info("Rejected link %s (%s)", url, reason)
+        return reason
+
+    def _reason(self, url: str) -> str | None:
+        path = urlsplit(url).path
+        if self.max_depth and len([s for s in path.split("/") if s]) > self.max_depth:
+            return "depth"
+        if any(p.search(url) for p in self.patterns):
+            return "pattern"
+        template = url_template(url)
+        if self.template_cap and self.templates[template] >= self.template_cap:
+            return "template_cap"
+        self.templates[template] += 1
+        return None
+
+
+def url_to_filename(u: str) -> str:
+    """A pure function of the URL, so every run and every shard agrees on it.
+
+    Sanitising folds "/", ".", "_", "?"... into "_", so two URLs can sanitise alike ("/a/b",
+    "/a_b", "/a.b"). The plain name is kept only where it is unambiguous - a path of letters,
+    digits and "-" between single slashes, no query - which keeps names of ordinary pages unchanged
+    from the old scheme. Everything else, and names too long for the filesystem, carries a hash of
+    the full URL.
+    """
+    name = re.sub(r"[^\w\-]+", "_", u)
+    parts = urlsplit(u)
+    plain = not parts.query and _PLAIN_PATH.match(parts.path)
+    if plain and len(name) <= FILENAME_MAX:
+        return name
+    digest = hashlib.sha1(u.encode("utf-8")).hexdigest()[:HASH_LEN]
+    return f"{name[: FILENAME_MAX - HASH_LEN - 1]}-{digest}"